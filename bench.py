@@ -0,0 +1,375 @@
+"""Benchmarks for the game, run with `python bench.py <suite>`
+
+Suites:
+  solver - plays games with mod/solver.py and reports the solve rate and
+           the time per move, e.g. `python bench.py solver --size 30x16 --mines 99`
+  core   - times the core board operations (Grid.get/set/iterneighbours,
+           initialize, labelling the openings, forestfires, Field.click and
+           Field.draw) over board sizes from 10x10 to 2000x2000 and
+           densities from 10% to 90%,
+           e.g. `python bench.py core --out base.json` and later
+           `python bench.py core --compare base.json` to catch regressions
+  selfplay - plays the same games with selfplay.py on 1, 2, 4... worker
+           processes up to the number of cores and reports games/s and
+           the speedup over one worker
+  startup - starts the game in a fresh process a few times and times how
+           long it takes to get to the first frame, `--limit 300` fails
+           if the median is slower than 300 ms
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+from time import perf_counter
+
+from mod.engine import Board
+from mod.openings import Openings
+from mod.solver import solve
+
+def parsesize(text):
+    w, h = text.lower().split("x")
+    return int(w), int(h)
+
+def bench_solver(args):
+    width, height = args.size
+
+    wins = moves = guesses = 0
+    time = 0.0
+    for n in range(args.games):
+        res = solve(Board(width, height, args.mines, seed=args.seed + n))
+        wins += res.won
+        moves += res.moves
+        guesses += res.guesses
+        time += res.time
+
+    print(f"board:         {width}x{height}, {args.mines} mines")
+    print(f"games:         {args.games}")
+    print(f"solve rate:    {wins / args.games:.1%}")
+    print(f"guesses/game:  {guesses / args.games:.2f}")
+    print(f"time/game:     {time / args.games * 1000:.2f} ms")
+    print(f"time/move:     {time / max(moves, 1) * 1e6:.1f} us")
+
+# core suite
+
+SIZES = (10, 50, 200, 1000, 2000)
+DENSITIES = (0.1, 0.3, 0.5, 0.7, 0.9)
+QUICKSIZES = (10, 200)
+QUICKDENSITIES = (0.1, 0.5)
+
+def best(fn, repeat, setup=None):
+    """The fastest of `repeat` runs of fn(setup()), in seconds."""
+    times = []
+    for _ in range(repeat):
+        arg = setup() if setup else None
+        start = perf_counter()
+        fn(arg)
+        times.append(perf_counter() - start)
+    return min(times)
+
+def newboard(size, density, seed=0):
+    # the 5x5 around the first click is kept free of mines
+    mines = min(round(size * size * density), size * size - 25)
+    return Board(size, size, mines, seed=seed)
+
+def playedboard(size, density, seed=0):
+    board = newboard(size, density, seed)
+    board.click((size // 2, size // 2))
+    return board
+
+def bench_grid(size, density, repeat, ops=20000):
+    """Per call times of the Grid accessors."""
+    grid = playedboard(size, density).grid
+    rng = random.Random(0)
+    cells = [(rng.randrange(size), rng.randrange(size)) for _ in range(ops)]
+
+    def get(_):
+        for c in cells:
+            grid.get(c)
+
+    def set_(_):
+        for c in cells:
+            grid.set(c, (0, 1, 0, 0))
+
+    def neighbours(_):
+        for c in cells:
+            for _ in grid.iterneighbours(c):
+                pass
+
+    return {
+        "grid.get": best(get, repeat) / ops,
+        "grid.set": best(set_, repeat) / ops,
+        "grid.iterneighbours": best(neighbours, repeat) / ops,
+    }
+
+def bench_board(size, density, repeat):
+    """Times of initializing a board, labelling its openings (that's left
+    until after the first click) and of its first opening.
+    """
+    first = (size // 2, size // 2)
+
+    def initialize(board):
+        board.initialize(board.safezone(first), random.Random(0))
+
+    def forestfires(board):
+        board.forestfires(first)
+
+    def openings(board):
+        Openings(board.grid)
+
+    def initialized(_=None):
+        board = newboard(size, density)
+        initialize(board)
+        return board
+
+    return {
+        "initialize": best(initialize, repeat, lambda: newboard(size, density)),
+        "openings": best(openings, repeat, initialized),
+        "forestfires": best(forestfires, repeat, initialized),
+    }
+
+class Host:
+    """Just enough of the game for a Field to draw offscreen."""
+
+    bg_color = (255, 255, 255)
+
+    def __init__(self, size):
+        self.size = size
+        self.state = None
+        self.verycoolfont = None
+
+    @property
+    def w(self):
+        return self.size[0]
+
+    @property
+    def h(self):
+        return self.size[1]
+
+    def lost(self):
+        pass
+
+    def won(self):
+        pass
+
+    def generated(self, board):
+        pass
+
+def bench_field(size, density, repeat, clicks=50):
+    """Times of Field.click and Field.draw (full and after a click) on an
+    offscreen surface the size of the window.
+    """
+    import pygame
+    from consts import State
+    from field import Field
+
+    host = Host((800, 800))
+    host.state = State.playing
+    surface = pygame.Surface(host.size)
+
+    def newfield():
+        return Field(host, board=playedboard(size, density))
+
+    def safecells(field, n):
+        # covered cells without mines that are on the screen
+        left, top, right, bottom = field.camera.visible()
+        grid = field.board.grid
+        cells = [
+            (x, y) for y in range(top, bottom + 1) for x in range(left, right + 1)
+            if not grid.ismine((x, y)) and not grid.isuncovered((x, y))
+        ]
+        random.Random(0).shuffle(cells)
+        return [field.grid2pixel((x + 0.5, y + 0.5)) for x, y in cells[:n]]
+
+    def clicksetup():
+        field = newfield()
+        field.draw(surface)
+        return field, safecells(field, clicks)
+
+    def click(arg):
+        field, pixels = arg
+        for pos in pixels:
+            field.click(pos, False)
+
+    def fulldraw(field):
+        field.markall()
+        field.draw(surface)
+
+    def clickdraw(field):
+        field.draw(surface)
+
+    def clickdrawsetup():
+        field, pixels = clicksetup()
+        if pixels:
+            field.click(pixels[0], False)
+        return field
+
+    n = max(len(clicksetup()[1]), 1)
+    return {
+        "field.click": best(click, repeat, clicksetup) / n,
+        "field.draw.full": best(fulldraw, repeat, newfield),
+        "field.draw.click": best(clickdraw, repeat, clickdrawsetup),
+    }
+
+def bench_core(args):
+    sizes = QUICKSIZES if args.quick else SIZES
+    densities = QUICKDENSITIES if args.quick else DENSITIES
+
+    render = not args.norender
+    if render:
+        # the assets are loaded relative to the game's folder
+        os.chdir(os.path.dirname(os.path.abspath(__file__)))
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        try:
+            import field  # noqa: F401 (also sets up pygame)
+        except Exception as e:
+            print(f"skipping the Field benchmarks, the game can't start here: {e}", file=sys.stderr)
+            render = False
+
+    results = {}
+    for size in sizes:
+        for density in densities:
+            parts = [bench_grid, bench_board] + ([bench_field] if render else [])
+            for part in parts:
+                for name, secs in part(size, density, args.repeat).items():
+                    key = f"{name}/{size}x{size}/{density:.0%}"
+                    results[key] = secs
+                    print(f"{key:40} {secs * 1e6:12.2f} us", file=sys.stderr)
+
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        return compare(args.compare, results, args.threshold)
+    return 0
+
+def compare(path, results, threshold):
+    """Print how results changed from a stored run, flagging every time
+    that got more than `threshold` slower. Returns 1 if any did.
+    """
+    with open(path) as f:
+        baseline = json.load(f)["results"]
+
+    regressions = 0
+    for key, secs in results.items():
+        old = baseline.get(key)
+        if not old:
+            continue
+        change = secs / old - 1
+        flag = ""
+        if change > threshold:
+            flag = "  <-- REGRESSION"
+            regressions += 1
+        print(f"{key:40} {old * 1e6:12.2f} -> {secs * 1e6:12.2f} us  {change:+7.1%}{flag}")
+
+    print(f"{regressions} regressions (threshold {threshold:.0%})")
+    return 1 if regressions else 0
+
+# startup suite
+
+# runs in the child process, prints the seconds from before the first
+# import to after the first frame is on the screen
+STARTUP = """
+from time import perf_counter
+start = perf_counter()
+import game
+game.Minesweeper.resume = lambda self: None  # no "carry on?" question
+mine = game.Minesweeper()
+mine.update()
+print(perf_counter() - start)
+"""
+
+def bench_startup(args):
+    here = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ)
+    env.setdefault("SDL_VIDEODRIVER", "dummy")
+
+    times = []
+    for _ in range(args.repeat):
+        res = subprocess.run(
+            [sys.executable, "-c", STARTUP], cwd=here, env=env,
+            capture_output=True, text=True
+        )
+        if res.returncode != 0:
+            print(res.stderr, file=sys.stderr)
+            return 1
+        times.append(float(res.stdout.split()[-1]) * 1000)
+
+    median = statistics.median(times)
+    print(f"runs:          {args.repeat}")
+    print(f"first frame:   {median:.1f} ms (median), {min(times):.1f} ms (best)")
+    if args.limit is not None and median > args.limit:
+        print(f"slower than the limit of {args.limit:.0f} ms")
+        return 1
+    return 0
+
+# selfplay suite
+
+def bench_selfplay(args):
+    import selfplay
+
+    width, height = args.size
+    counts = []
+    n = 1
+    while n < args.workers:
+        counts.append(n)
+        n *= 2
+    counts.append(args.workers)
+
+    base = None
+    print(f"board:         {width}x{height}, {args.mines} mines, {args.games} games")
+    for workers in counts:
+        start = perf_counter()
+        selfplay.run(width, height, args.mines, args.games, workers=workers)
+        rate = args.games / (perf_counter() - start)
+        base = base or rate
+        print(f"{workers:3} workers:   {rate:8.1f} games/s  x{rate / base:.2f}")
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Minesweeper benchmarks")
+    suites = parser.add_subparsers(dest="suite", required=True)
+
+    sol = suites.add_parser("solver", help="solve rate and time per move")
+    sol.add_argument("--size", type=parsesize, default=(30, 16), help="WIDTHxHEIGHT")
+    sol.add_argument("--mines", type=int, default=99)
+    sol.add_argument("--games", type=int, default=100)
+    sol.add_argument("--seed", type=int, default=0)
+    sol.set_defaults(run=bench_solver)
+
+    core = suites.add_parser("core", help="times of the core board operations")
+    core.add_argument("--repeat", type=int, default=5, help="runs per timing, the best one counts")
+    core.add_argument("--quick", action="store_true", help="only a few sizes and densities")
+    core.add_argument("--norender", action="store_true", help="skip the Field benchmarks")
+    core.add_argument("--out", help="write the results to this JSON file")
+    core.add_argument("--compare", help="JSON file of an earlier run to compare with")
+    core.add_argument("--threshold", type=float, default=0.2, help="slowdown that counts as a regression")
+    core.set_defaults(run=bench_core)
+
+    play = suites.add_parser("selfplay", help="selfplay.py games/s over the cores")
+    play.add_argument("--size", type=parsesize, default=(30, 16), help="WIDTHxHEIGHT")
+    play.add_argument("--mines", type=int, default=99)
+    play.add_argument("--games", type=int, default=400)
+    play.add_argument("--workers", type=int, default=os.cpu_count(), help="most processes to try")
+    play.set_defaults(run=bench_selfplay)
+
+    start = suites.add_parser("startup", help="time from launch to the first frame")
+    start.add_argument("--repeat", type=int, default=5, help="processes to start")
+    start.add_argument("--limit", type=float, help="fail if the median is slower (ms)")
+    start.set_defaults(run=bench_startup)
+
+    args = parser.parse_args(argv)
+    return args.run(args)
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,28 +1,65 @@
 """Constants for the entire game"""
 
 import pygame
-from enum import Enum
-from typing import Tuple, Union
+from typing import Optional, Tuple, Union
 
-from settingswin import SettingsWin
+from mod.engine import State
+from settingswin import SettingsWin, newroot
 
 Coords = Tuple[Union[int, float], Union[int, float]]
 
+class LazySettings:
+    """Stands in for the settings window until it's first used, so its
+    widgets aren't made before the settings are opened.
+    """
+
+    def __init__(self, root):
+        self._root = root
+        self._win: Optional[SettingsWin] = None
+        self._game = None
+
+    @property
+    def active(self) -> bool:
+        return self._win is not None and self._win.active
+
+    @property
+    def available(self) -> bool:
+        """False if Tk couldn't make its root (no display for it), then
+        there's no settings window at all.
+        """
+        return self._root is not None
+
+    def get(self) -> SettingsWin:
+        if self._win is None:
+            if self._root is None:
+                raise RuntimeError("No Tk root for the settings window")
+            self._win = SettingsWin(self._root)
+            self._win._game = self._game
+        return self._win
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
 # A bit hacky
 # I want to create a TKinter window for settings BUT I
 # inexplicably cannot do this. It will make an error that
 # looks like a C traceback and stackoverflow has no
 # clarification on this BUT it won't error if the window
-# is created before pygame is initilialized sooo... I just
-# expand and minimize a single window
-tkwin = SettingsWin()
-pygame.init()
+# is created before pygame is initilialized sooo... the
+# (hidden) Tk root is made here and the settings window
+# and message boxes all go on it
+tkwin = LazySettings(newroot())
+# only the parts of pygame the game uses, pygame.init() also starts
+# audio, joysticks and so on
+pygame.display.init()
+pygame.font.init()
 
-segfont = pygame.font.Font("assets/DSEG14Modern-Bold.ttf", 20)
-
-flagico = pygame.image.load("assets/flag.png")
-mineico = pygame.image.load("assets/mine.png")
-xico = pygame.image.load("assets/cross.png")
+# the fonts and images are loaded when they're first used (see mod/assets.py)
+SEGFONT = "assets/DSEG14Modern-Bold.ttf"
+TITLEFONT = "assets/minesweeper.ttf"
+FLAGICO = "assets/flag.png"
+MINEICO = "assets/mine.png"
+XICO = "assets/cross.png"
 
 numtocol = {
     1: "#0000ff",
@@ -35,10 +72,3 @@ numtocol = {
     8: "#757575"
 }
 FPS = 40  # Frames per second
-
-# just state instead of GameState for simplicity
-class State(Enum):
-    startscreen = 0
-    playing = 1
-    lost = 2
-    won = 3
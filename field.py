@@ -3,25 +3,33 @@
 from __future__ import annotations
 
 import pygame
-from math import floor, ceil
-from random import randrange
-from typing import TYPE_CHECKING
+from math import floor
+from typing import TYPE_CHECKING, Optional, Union
 
 from consts import (
     numtocol,
-    xico,
-    flagico,
-    mineico,
-    State,
+    XICO,
+    FLAGICO,
+    MINEICO,
+    TITLEFONT,
     Coords
 )
+from mod.assets import assets
+from mod.camera import Camera
+from mod.endless import EndlessBoard
+from mod.engine import Board, State
 from mod.grid import Grid
+from mod.overview import Overview
+from mod.probability import Heatmap
+from mod.profiler import profiler
+from mod.replay import CHORD, FLAG, OPEN, UNDO, Move, apply
 
 if TYPE_CHECKING:
     from game import Minesweeper
 
 class Field:
-    box: pygame.Surface
+    tiles: dict
+    surface: pygame.Surface
     flagico: pygame.Surface
     mineico: pygame.Surface
     xico: pygame.Surface
@@ -31,40 +39,53 @@ class Field:
     left: int
     right: int
 
-    def __init__(self, game: Minesweeper, mines: int = 20):
+    def __init__(
+        self,
+        game: Minesweeper,
+        mines: int = 20,
+        noguess: bool = False,
+        board: Optional[Union[Board, EndlessBoard]] = None
+    ):
         self._game = game
 
-        # TUPLE STRUCT:
-        #  (0, 0, 0, 0)
-        #            - Is this square flagged?
-        #         - How many mines are around it? [TODO: do on the fly?]
-        #      - Is this square uncovered?
-        #   - Does this square have a mine?
-        self._grid = Grid(game.width, game.height, (0, 0, 0, 0))
-
-        # Minimum size of a square. Maybe move to consts.py?
+        # all of the game logic lives in the board, this class only
+        # shows it on the screen and passes the clicks along
+        self.board = board or Board(
+            game.width, game.height, mines, noguess, topology=game.topology
+        )
+        # endless boards have no edges (or flat indices)
+        self.bounded = isinstance(self.board, Board)
+        # every move gets logged to this if it's set (see mod/replay.py)
+        self.recorder = None
+        # mine chances shown on the covered squares (see toggleheatmap)
+        self.heatmap: Optional[Heatmap] = None
+        # the whole board as a picture, one pixel per cell, for when it's
+        # zoomed out too far for tiles and for the minimap (normal boards)
+        self.overview = Overview(self.board, numtocol) if self.bounded else None
+        # at this square size or smaller the board is drawn from the overview
+        self.pixelsqrsize = 5
+        # a small picture of the whole board in the corner when it doesn't fit
+        self.showminimap = True
+        self.minimapsize = 150
+
+        # Minimum size of a square when the board is fitted to the window,
+        # past that the board overflows and has to be panned around.
+        # Maybe move to consts.py?
         self.minsqrsize = 15
-
-        # These are set in the next function
-        self.sqrsize = 0  # size of a square (will adjust)
-        self.margins = (0, 0)  # margins for (leftright, updown)
+        # Square size of endless boards
+        self.endlesssqrsize = 30
+        # endless boards have no overview to draw from when zoomed far out,
+        # every square is a lookup so they can't get as small
+        self.endlessminsqrsize = 10
+
+        # what part of the board is on the screen (see adjust)
+        self.camera = Camera(minsqrsize=1 if self.bounded else self.endlessminsqrsize)
+        self.margins = (0, 0)  # top left corner of the board's view
         self.mainfont: pygame.font.Font  # the font for the mine numbers
 
         self.adjust()
 
-        # All mineless squares uncovered add to the counter
-        # All mined squares flagged add to the counter
-        # Other states do not
-        self.correctsquares = 0
-        self.flagged = mines  # for the mine counter, is subtrated from over time
-        self.minesno = mines  # num o' mines
-
-        self.target = None  # the mine they clicked and lost
-        # the field isn't initialized until the user clicks to guarantee
-        # they don't immediately click on a mine
-        self.initialized = False
-
-    # these 3 are shortcuts
+    # these are shortcuts
 
     @property
     def w(self) -> int:
@@ -82,6 +103,47 @@ class Field:
     def state(self, val):
         self._game.state = val
 
+    @property
+    def sqrsize(self):
+        return self.camera.sqrsize
+
+    @property
+    def _grid(self) -> Grid:
+        return self.board.grid
+
+    @property
+    def flagged(self) -> int:
+        # endless boards count up the squares uncovered instead
+        if not self.bounded:
+            return self.board.revealed
+        return self.board.flagged
+
+    @property
+    def minesno(self) -> int:
+        return self.board.minesno
+
+    @property
+    def correctsquares(self) -> int:
+        return self.board.correctsquares
+
+    @property
+    def target(self):
+        return self.board.target
+
+    @property
+    def hexrows(self) -> bool:
+        """Hex boards are drawn with every odd row pushed half a square."""
+        return self.bounded and self._grid.topology == "hex"
+
+    @property
+    def pixelmode(self) -> bool:
+        """Too zoomed out for tiles? (hex boards always use them)"""
+        return self.overview is not None and self.sqrsize <= self.pixelsqrsize and not self.hexrows
+
+    @property
+    def initialized(self) -> bool:
+        return self.board.initialized
+
     @property
     def minmargin(self):
         # I don't exactly remember why I made this, but
@@ -92,250 +154,387 @@ class Field:
     def adjust(self):
         """Function to manage adjustent of field size on screen (super high tech!!)."""
         # If only I was using html
-        # TODO: clicking in small dimensions doesn't work
 
         # FIRST PART: adjust grid
-        if (self._grid.rows() > self._grid.cols()) or (self.h < self.w):
-            #   The field height is bigger
-            #               OR
-            #   the pixel height is smaller
-            #   so the minmargin will be the topbottom
-            #   and the calculated margin will be leftright
-            check = True
-        elif (self._grid.rows() < self._grid.cols()) or (self.h > self.w):
-            # This is the opposite
-            check = False
-        else:
-            check = None
-
-        # For the suffixes: 
-        #   p = pixels dimensions
-        #   f = field dimensions
-        if check:
-            biggerp = self.h
-            smallerp = self.w
-            biggerf = self._grid.rows()
+        if not self.bounded:
+            sqrsize = self.endlesssqrsize
+            cells = None
         else:
-            biggerp = self.w
-            smallerp = self.h
-            biggerf = self._grid.cols()
-
-        # The size of all squares
-        self.sqrsize = (biggerp - (2 * self.minmargin))/biggerf
-        # self.sqrsize += self.sqrsize * 0.05
-        if self.sqrsize < self.minsqrsize:
-            self.sqrsize = self.minsqrsize
-
-        # compensate for decimal rounding
-        # TODO:
-        #   Compensation still doesn't work sometimes probably because of the
-        #   prioritization of one axis over the other on even-sided grids
-        compensation = 0
-        if (compen := self.sqrsize % 1) != 0:
-            # split amongst each margin
-            compensation = (compen * biggerf)/2
-            self.sqrsize = floor(self.sqrsize)
-
-        if check:
-            self.margins = (ceil(compensation + (smallerp - (self._grid.cols() * self.sqrsize)) / 2), compensation + self.minmargin)
-        else:
-            self.margins = (compensation + self.minmargin, ceil(compensation + (smallerp - self._grid.rows() * self.sqrsize) / 2))
+            if (self._grid.rows() > self._grid.cols()) or (self.h < self.w):
+                #   The field height is bigger
+                #               OR
+                #   the pixel height is smaller
+                #   so the minmargin will be the topbottom
+                #   and the calculated margin will be leftright
+                check = True
+            else:
+                # This is the opposite
+                check = False
+
+            # For the suffixes:
+            #   p = pixels dimensions
+            #   f = field dimensions
+            if check:
+                biggerp = self.h
+                biggerf = self._grid.rows()
+            else:
+                biggerp = self.w
+                biggerf = self._grid.cols()
+                if self.hexrows:
+                    biggerf += 0.5  # odd rows stick out half a square
+
+            # The size of all squares, when it's too small the board
+            # overflows the view and the camera can be panned around
+            sqrsize = (biggerp - (2 * self.minmargin))/biggerf
+            sqrsize = max(floor(sqrsize), self.minsqrsize)
+            cells = (self._grid.cols(), self._grid.rows())
+
+        # The board is shown in the screen minus the margins, the camera
+        # centers it in there if it's smaller
+        margin = round(self.minmargin)
+        view = (margin, margin, max(self.w - 2*margin, 1), max(self.h - 2*margin, 1))
+        self.camera.setview(view, sqrsize, cells, self.hexrows)
+
+        self.margins = (view[0], view[1])
+        self.top = view[1]
+        self.bottom = view[1] + view[3]
+        self.left = view[0]
+        self.right = view[0] + view[2]
+
+        # the part of the board on screen is kept drawn on its own surface
+        # between frames and only the cells that changed get redrawn on it
+        # (see draw())
+        self.surface = pygame.Surface((view[2], view[3]))
 
-        self.top = round(self.minmargin)
-        self.bottom = round(biggerp - self.minmargin)
-        self.left = round(self.margins[1])
-        self.right = round(smallerp - self.minmargin)
+        # SECOND PART: adjust icons and fonts
+        self.adjustsize()
 
-        self.box = pygame.Surface((self.sqrsize, self.sqrsize))
+    def adjustsize(self):
+        """Scale the icons and fonts to the square size and rebuild the tiles.
 
-        # SECOND PART: adjust icons and fonts
+        All of them come from the asset cache (mod/assets.py) so sizes
+        that were used before don't get made again.
+        """
         biggersize = self.sqrsize * 1.3  # make it fill the square better
-        self.flagico = pygame.transform.scale(
-            flagico,
-            (self.sqrsize, self.sqrsize)
-        )
-        self.mineico = pygame.transform.scale(
-            mineico,
-            (self.sqrsize, self.sqrsize)
-        )
-        self.xico = pygame.transform.scale(
-            xico,
-            (self.sqrsize, self.sqrsize)
-        )
-        self.mainfont = pygame.font.SysFont("Corbel", round(biggersize))
-        self._game.verycoolfont = pygame.font.Font("assets/minesweeper.ttf", round(biggersize/3))
+        self.flagico = assets.icon(FLAGICO, self.sqrsize)
+        self.mineico = assets.icon(MINEICO, self.sqrsize)
+        self.xico = assets.icon(XICO, self.sqrsize)
+        self.mainfont = assets.sysfont("Corbel", round(biggersize))
+        self._game.verycoolfont = assets.font(TITLEFONT, round(biggersize/3))
+
+        # THIRD PART: pre-draw every way a cell can look
+        self.tiles = assets.get(("tiles", self.sqrsize), self.maketiles)
+        self.markall()
+
+    def maketiles(self):
+        """Build the tile atlas, one finished surface per cell look.
+
+        Keys are "covered", "flag", "mine", "wrong", "target", the
+        numbers 0-8 for uncovered squares (0 being blank) and
+        ("heat", 0-10, approximate) for covered squares under the heatmap.
+        Returns the atlas.
+        """
+        def tile(color, number=0, icons=()):
+            surf = pygame.Surface((self.sqrsize, self.sqrsize))
+            surf.fill(pygame.Color(color))
+            pygame.draw.rect(
+                surf,
+                (0, 0, 0),
+                rect=pygame.Rect(0, 0, self.sqrsize, self.sqrsize),
+                width=1
+            )
+            if number > 0:
+                self.writeonmine(surf, number)
+            for ico in icons:
+                surf.blit(ico, (0, 0))
+            return surf
+
+        tiles = {
+            "covered": tile("grey"),
+            "flag": tile("grey", icons=(self.flagico,)),
+            "mine": tile("white", icons=(self.mineico,)),
+            "wrong": tile("white", icons=(self.mineico, self.xico)),
+            "target": tile("red", icons=(self.mineico,)),
+        }
+        for number in range(9):
+            tiles[number] = tile("white", number)
+
+        # covered squares tinted from green (safe) to red (mine) for the
+        # heatmap, one tile per 10%, crossed out when the chance is only a
+        # guess (see mod/probability.py)
+        for step in range(self.heatsteps + 1):
+            for approximate in (False, True):
+                surf = tile("grey")
+                inner = max(self.sqrsize - 2, 0)
+                tint = pygame.Surface((inner, inner))
+                tint.fill(self.heatcolor(step / self.heatsteps))
+                tint.set_alpha(150)
+                surf.blit(tint, (1, 1))
+                if approximate:
+                    pygame.draw.line(surf, (90, 90, 90), (1, self.sqrsize - 2), (self.sqrsize - 2, 1))
+                tiles["heat", step, approximate] = surf
+        return tiles
+
+    heatsteps = 10
+
+    @staticmethod
+    def heatcolor(p):
+        """Green at 0, yellow at 0.5 and red at 1."""
+        return (round(255 * min(2 * p, 1)), round(255 * min(2 * (1 - p), 1)), 0)
 
     def __iter__(self):
         """Shortcut for iterating the grid"""
         yield from self._grid
 
-    def initialize(self, theexempt):
-        """Setup all the mines in the field."""
-        for _ in range(self.minesno):
-            while True:
-                x = randrange(self._grid.cols())
-                y = randrange(self._grid.rows())
-                if (x, y) in theexempt:
-                    continue
-                if self._grid.get((x, y))[0] == 0:
-                    break
-
-            # TODO: ik about this fix it
-            # to clarify: the fact I have to set every single data even
-            # if I'm only changing one
-            self._grid.set((x, y), (1, 0, 0, 0))
-        for tile in self:
-            data = self._grid.get(tile)
-            if data[0] == 1:
-                continue
+    def cell(self, pos):
+        """The (mined, uncovered, mines, flagged) tuple of a cell."""
+        if self.bounded:
+            return self._grid.get(pos)
+        return self.board.get(pos)
 
-            count = 0
-            for nb in self._grid.iterneighbours(tile):
-                ctile = self._grid.get(nb)
-                if ctile[0] == 1:
-                    count += 1
+    def click(self, pos, flagging, chording=False):
+        """Handle clicking on the minefield"""
+        if not self.camera.inview(pos):
+            return
+        fresh = not self.initialized
+        try:
+            self.clickcell(self.pixel2grid(pos), flagging, chording)
+        except ValueError as e:
+            # the mines don't fit on the board (the settings check for that)
+            self._game.cantplay(str(e))
+            return
+        if fresh and self.initialized and self.bounded:
+            self._game.generated(self.board)
+
+    def clickcell(self, cell, flagging, chording=False):
+        """Open, flag or chord a cell of the board, also used by replays."""
+        if chording:
+            # chords are only for normal boards
+            changed = self.board.chord(cell) if self.bounded else []
+            kind = CHORD
+        else:
+            changed = self.board.click(cell, flagging)
+            kind = FLAG if flagging else OPEN
+        self.moved(changed, kind, cell)
+        self.checkover()
+
+    def playmove(self, move: Move):
+        """Do a move of a replay, the same way mod.replay.verify does."""
+        self.moved(apply(self.board, move), move.kind, move.cell)
+        if move.kind == UNDO:
+            self.undone()
+        else:
+            self.checkover()
 
-            self._grid.set(tile, (data[0], data[1], count, 0))
+    def checkover(self):
+        """Tell the game if the last move ended it."""
+        if self.board.state is State.lost:
+            self._game.lost()
+        elif self.board.state is State.won:
+            self._game.won()
 
-    def forestfires(self, pos, _from: list = []):
-        """This is a recursive function that clears all neighbouring empty squares
-        if empty square was clicked. Thus, a forest fire.
-        """
-        for tile in self._grid.iterneighbours(pos):
-            # Remove all their flags
-            mined, uncovered, mines, _ = self._grid.get(tile)
-            if uncovered:
-                continue
-            if tile in _from:
-                continue
-            
-            self._grid.set(tile, (mined, 1, mines, 0))
-            if mines == 0:
-                _from.append(pos)
-                self.forestfires(tile, _from)
+    def undone(self):
+        # taking back a losing move carries on the game
+        if self.state is not self.board.state:
+            self.state = self.board.state
 
-    def click(self, pos, flagging):
-        """Handle clicking on the minefield"""
-        cell = self.pixel2grid(pos)
-        x, y = cell
-        if x < 0 or x > self._grid.rows() or y < 0 or y > self._grid.cols():
-            return  # outtabounds
-
-        # decides the positions of all the mines on the first click
-        if self.initialized == False:
-            listt = [cell]
-            ncells = list(self._grid.iterneighbours(cell))
-            listt += ncells
-            for i in ncells:
-                listt += list(self._grid.iterneighbours(i))
-
-            listt = list(set(listt))
-            self.initialize(listt)
-            self.initialized = True
-
-        data = self._grid.get(cell)
-        if data is None:
+    def undo(self):
+        """Take back the last move (normal boards only)."""
+        if not self.bounded:
             return
+        self.moved(self.board.undo(), UNDO, (0, 0))
+        self.undone()
 
-        mined, uncovered, mines, flagged = data
-        # ignore already uncovered mines
-        if uncovered:
+    def redo(self):
+        """Play the last move that was taken back again."""
+        if not self.bounded or not self.board.redos:
             return
-
-        if flagging:
-            # if right clicking
-            if not flagged:
-                flagged = 1
-                self.flagged -= 1
-                if mined:
-                    self.correctsquares += 1
-            else:
-                flagged = 0
-                self.flagged += 1
-                if mined:
-                    self.correctsquares -= 1
-            self._grid.set(cell, (mined, uncovered, mines, flagged))
-        else:
-            # if left clicking
-            if flagged:
-                return
-            if mined:
-                self.target = cell
-                self._game.lost()
-                return
-
-            self._grid.set(cell, (mined, 1, mines, 0))
-            if mines == 0:
-                # empty square, so clear neighbours
-                self.forestfires(cell, _from=[])
-
-        if self.correctsquares == self.minesno:
-            self._game.won()
+        kind, cell = self.board.redos[-1]
+        kind = {"open": OPEN, "flag": FLAG, "chord": CHORD}[kind]
+        self.moved(self.board.redo(), kind, cell)
+        self.checkover()
+
+    def moved(self, changed, kind, cell):
+        """Catch everything up with a move that changed these cells."""
+        self.markdirty(changed)
+        if changed and kind != FLAG and self.heatmap is not None:
+            # uncovering anything can move every other square's chance
+            self.heatmap.update(changed)
+            self.markall()
+        if changed and self.recorder is not None:
+            self.recorder.record(kind, cell)
+
+    def toggleheatmap(self):
+        """Show or hide the chance of a mine on every covered square."""
+        if self.heatmap is not None:
+            self.heatmap = None
+        elif self.bounded:
+            self.heatmap = Heatmap(self.board)
+        self.markall()
 
     def grid2pixel(self, pos: Coords) -> Coords:
         # given a position where pos = (x, y) is in grid coordinates
         # return the pixel coordinates of the northwest corner of pos
+        return self.camera.grid2pixel(pos)
 
-        x, y = pos
-        return (self.sqrsize * x, self.sqrsize * y)
-    
     def pixel2grid(self, pos: Coords) -> Coords:
         # given a position where pos = (x, y) is in pixel coordinates
-        # return the grid coordinates of the northwest corner of pos
-        x, y = pos
-        x, y = x-self.margins[0], y-self.margins[1]
-        res = (int(x // self.sqrsize), int(y // self.sqrsize))
-        return res
-    
+        # return the grid coordinates of the cell under it
+        return self.camera.pixel2grid(pos)
+
+    def pan(self, dx, dy):
+        """Move the board around the view by (dx, dy) pixels."""
+        old = self.camera.offset
+        self.camera.pan(dx, dy)
+        if self.camera.offset != old:
+            self.markall()
+
+    def zoomat(self, pos: Coords, factor: float):
+        """Zoom in (factor > 1) or out around a pixel."""
+        if self.camera.zoom(factor, pos):
+            self.adjustsize()
+
+    # Past this many changed cells it's cheaper to push the whole board
+    # to the screen as one rect than as lots of small ones
+    maxdirtyrects = 256
+
+    def markdirty(self, changed):
+        """Queue cells to be redrawn on the next frame (flat indices, or
+        cells for endless boards).
+        """
+        if self.overview is not None:
+            self.overview.update(changed)
+        if self._alldirty:
+            return
+        if len(changed) > self.maxdirtyrects:
+            # only the cells in view get redrawn so this is cheap
+            self.markall()
+        else:
+            self._dirty.update(changed)
+
+    def markall(self):
+        """Queue every cell in view to be redrawn on the next frame."""
+        self._alldirty = True
+        self._dirty = set()
+
+    @property
+    def screenpos(self) -> Coords:
+        """Where the board surface goes on the screen."""
+        return self.margins
+
     def draw(self, image: pygame.Surface):
-        """Draw the grid."""
-        for x, y in self:
-            self.draw_cell(image, (x, y))
+        """Draw the cells that changed since the last frame.
 
-    def draw_cell(self, image: pygame.Surface, pos):
-        """Draw a single cell."""
-        mined, uncovered, mines, flagged = self._grid.get(pos)
+        Only the cells in view are ever looked at. Returns the screen rects
+        that were touched so that only those have to be sent to the display.
+        Zoomed far out they're scaled from the overview (mod/overview.py)
+        instead of drawn tile by tile.
+        """
+        rects = self._drawcells(image)
+        if rects and self.minimapshown():
+            # on top of the screen, so the board surface stays clean
+            rects.append(self.drawminimap(image))
+        return rects
+
+    def _drawcells(self, image: pygame.Surface):
+        ox, oy = self.screenpos
+        if self.pixelmode:
+            if not self._alldirty and not self._dirty:
+                return []
+            # everything in view is scaled from the overview in one go
+            self.surface.fill(self._game.bg_color)
+            self.overview.draw(self.surface, self.camera)
+            left, top, right, bottom = self.camera.visible()
+            profiler.count("cells", (right - left + 1) * (bottom - top + 1))
+            self._alldirty = False
+            self._dirty = set()
+            return [image.blit(self.surface, (ox, oy))]
+
+        if self._alldirty:
+            if not self.bounded:
+                # make the chunks in view up front, not one get() at a time
+                self.board.touch(*self.camera.visible())
+                profiler.count("chunks", self.board.loaded)
+            self.surface.fill(self._game.bg_color)
+            drawn = 0
+            for pos in self.camera.itervisible():
+                self.draw_cell(self.surface, pos)
+                drawn += 1
+            profiler.count("cells", drawn)
+            self._alldirty = False
+            self._dirty = set()
+            return [image.blit(self.surface, (ox, oy))]
+
+        if not self._dirty:
+            return []
+
+        left, top, right, bottom = self.camera.visible()
+        rects = []
+        for item in self._dirty:
+            pos = self._grid.pos(item) if self.bounded else item
+            if not (left <= pos[0] <= right and top <= pos[1] <= bottom):
+                continue
+            self.draw_cell(self.surface, pos)
+            x, y = self.camera.grid2view(pos)
+            rects.append(pygame.Rect(x, y, self.sqrsize, self.sqrsize))
+        self._dirty = set()
+        profiler.count("cells", len(rects))
+
+        return [image.blit(self.surface, (ox + r.x, oy + r.y), r) for r in rects]
+
+    def minimapshown(self) -> bool:
+        """The minimap is only there when the board doesn't fit the view."""
+        if not self.showminimap or self.overview is None:
+            return False
+        cam = self.camera
+        cols, rows = cam.cells
+        return cols * cam.sqrsize > cam.view[2] or rows * cam.sqrsize > cam.view[3]
+
+    def drawminimap(self, image: pygame.Surface) -> pygame.Rect:
+        """Draw the minimap in the bottom right corner of the view."""
+        mini = self.overview.minimap(self.camera, self.minimapsize)
+        pos = (self.right - mini.get_width() - 4, self.bottom - mini.get_height() - 4)
+        return image.blit(mini, pos)
+
+    def toggleminimap(self):
+        self.showminimap = not self.showminimap
+        self.markall()
+
+    def tilekey(self, pos):
+        """Which tile of the atlas a cell looks like right now."""
+        mined, uncovered, mines, flagged = self.cell(pos)
 
         if pos == self.target:
-            color = pygame.Color("red")
-        elif (
-            uncovered
-            or (self.state is State.lost and (bool(mined) ^ bool(flagged)))  # XOR operation
-            or (self.state is State.won and (not uncovered ^ bool(flagged)))
-        ):
-            color = pygame.Color("white")
-        else:
-            color = pygame.Color("grey")
-
-        self.box.fill(color)
-        pygame.draw.rect(
-            self.box,
-            (0, 0, 0),
-            rect=pygame.Rect(0, 0, self.sqrsize, self.sqrsize), #self.box.get_width(), self.box.get_height()),
-            width=1
-        )
-        if mines > 0 and (uncovered or (self.state is State.won and (not uncovered ^ bool(flagged)))):
-            self.writeonmine(self.box, mines)
-        drawx, drawy = self.grid2pixel(pos)
-        drawx, drawy = drawx + self.margins[0], drawy + self.margins[1]
+            return "target"
+        if uncovered:
+            return mines
 
         if self.state is State.lost:
-            # TODO: cleanup
             if mined and not flagged:
-                self.box.blit(self.mineico, (0, 0))
+                return "mine"
             elif not mined and flagged:
-                self.box.blit(self.mineico, (0, 0))
-                self.box.blit(self.xico, (0, 0))
-            elif mined and flagged:
-                self.box.blit(self.flagico, (0, 0))
-        elif flagged:
-            self.box.blit(self.flagico, (0, 0))
+                return "wrong"
+        elif self.state is State.won and not flagged:
+            # when the game is won the rest of the squares are shown
+            return mines
+
+        if flagged:
+            return "flag"
+        if self.heatmap is not None and self.state is State.playing:
+            i = self._grid.index(pos)
+            p = self.heatmap.probability(i)
+            if p is not None:
+                return "heat", round(p * self.heatsteps), self.heatmap.approximate(i)
+        return "covered"
 
-        image.blit(self.box, (drawx-1, drawy-1))
+    def draw_cell(self, image: pygame.Surface, pos):
+        """Draw a single cell onto the board surface."""
+        image.blit(self.tiles[self.tilekey(pos)], self.camera.grid2view(pos))
 
     def writeonmine(self, image: pygame.Surface, number):
         """Used for showing the number of neighbours with mines."""
         textimg = self.mainfont.render(str(number), True, numtocol[number])
+        profiler.count("text")
         w = (image.get_width() - textimg.get_width()) / 2
         h = (image.get_height() - textimg.get_height()) / 2
         image.blit(textimg, (w, h))
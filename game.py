@@ -1,41 +1,117 @@
 """The Game"""
 
 import pygame
-from pygame.locals import VIDEORESIZE, MOUSEBUTTONDOWN, MOUSEBUTTONUP
-from tkinter import messagebox
-from typing import Union, Tuple
+from pygame.locals import (
+    VIDEORESIZE,
+    MOUSEBUTTONDOWN,
+    MOUSEBUTTONUP,
+    MOUSEMOTION,
+    MOUSEWHEEL,
+    K_LEFT, K_RIGHT, K_UP, K_DOWN,
+    KEYDOWN,
+    K_a, K_d, K_w, K_s,
+    K_F3, K_F4, K_h, K_m, K_y, K_z,
+    KMOD_CTRL, KMOD_SHIFT
+)
+import os
+import time
+from typing import Optional, Union, Tuple
 
 from field import Field
-from consts import segfont, tkwin, State, Coords
+from consts import SEGFONT, tkwin, State, Coords
+from mod.assets import assets
 from mod.buttons import Button
+from mod.endless import EndlessBoard
+from mod.engine import Board
 from mod.game import BasicGame
+from mod.profiler import profiler
+from mod.replay import Recorder, Replay
+from mod.save import SaveFile
+
+def dialogs():
+    """tkinter's message boxes, only imported once there's something to ask"""
+    from tkinter import messagebox
+    return messagebox
 
 class Minesweeper(BasicGame):
-    def __init__(self):
+    def __init__(self, savepath: Optional[str] = "save.msv"):
         self.bg_color = (255, 255, 255)
         super().__init__(size=(500, 500))
 
         self.minesno = 30
         self.height = 10
         self.width = 10
+        # only make boards that can be solved without guessing
+        self.noguess = False
+        # which squares are neighbours (see mod/topology.py)
+        self.topology = "square"
+        # play on a board with no edges instead
+        self.endless = False
+
+        # pixels the board moves per frame while an arrow key is held
+        self.panspeed = 12
+        # how much a notch of the mouse wheel zooms
+        self.zoomstep = 1.25
 
         # restart button
         self.resbtn = Button(self, "Restart")
         # settings button
-        self.settbtn = Button(self, "Settings")
+        if tkwin.available:
+            self.settbtn = Button(self, "Settings")
+        else:
+            # greyed out, there's no Tk to open the settings with
+            self.settbtn = Button(self, "Settings", textclr="#8c8c8c", btnclr="#dcdcdc", btnhoverclr="#dcdcdc")
 
         # current mouse position
         self.mousepos: Coords = (0, 0)
         # font obj for the title (to be set)
         self.verycoolfont: pygame.font.Font
-        self.gamesetup()
+        # screen rects that changed in the last draw, None means all of it
+        self.dirtyrects = None
+        # font of the frame profiler overlay (F3), made when it's first shown
+        self.hudfont = None
+        self._hudrect = None
+        # a drag-resize sends lots of resize events, everything's only
+        # adjusted once the size has stopped changing for this long (ms)
+        self.resizedelay = 150
+        self._resized = None  # when the last resize event came
+        # how the strip above the board looked when it was last drawn
+        self._metalook = None
+        # every game gets a replay in here (None to turn that off)
+        self.replaydir = "replays"
+        # the replay being watched: (moves left, speed, when the next one's due)
+        self.playback = None
+        self.recorder = None
+        # the game in progress is kept saved in here (None to turn that off)
+        self.savepath = savepath
+        self.savefile = None
+        self.gamesetup(self.resume())
 
         tkwin._game = self
 
-    def gamesetup(self):
-        """Setup/reset the game variables"""
+    @property
+    def state(self) -> State:
+        return self._state
+
+    @state.setter
+    def state(self, val: State):
+        # a state change can change how every cell looks
+        self._state = val
+        self.redrawall()
+
+    def redrawall(self):
+        """Make the next frame redraw the whole screen."""
+        self._fullredraw = True
+
+    def gamesetup(self, board=None):
+        """Setup/reset the game variables
+
+        A ready made board (e.g. from a board code) can be passed in.
+        """
         # mouse down state
         self.mdstate = False
+        # has the middle button moved since it went down (panning, not chording)
+        self.middledrag = False
 
         # confirming a restart variable
         self.rconfirm = False
@@ -43,34 +119,188 @@ class Minesweeper(BasicGame):
         # uses enum, the current state
         self.state = State.playing
 
+        if board is None and self.endless:
+            board = EndlessBoard()
+
         # the actual field
         self.field = Field(
             game=self,
-            mines=self.minesno
+            mines=self.minesno,
+            noguess=self.noguess,
+            board=board
         )
 
+        if self.savefile is not None and self.savefile.board is not board:
+            # the old game is gone
+            self.savefile.close(remove=True)
+            self.savefile = None
+
+        if self.recorder is not None:
+            self.recorder.close()
+        self.recorder = None
+        self.playback = None
+        # a replay has to start from the first click, so boards that come
+        # in already started (codes, saves) don't get one
+        if self.replaydir and self.field.bounded and not self.field.initialized:
+            name = time.strftime("%Y%m%d-%H%M%S") + ".msr"
+            self.recorder = Recorder(os.path.join(self.replaydir, name), self.field.board)
+        self.field.recorder = self.recorder
+
         self.adjust()
 
+    def resume(self):
+        """The board of the saved game if there is one and the player wants it"""
+        if not self.savepath or not os.path.exists(self.savepath):
+            return None
+        try:
+            save = SaveFile.open(self.savepath)
+        except (OSError, ValueError):
+            os.remove(self.savepath)
+            return None
+        if save.board.over or not dialogs().askyesno("Welcome back", "Do you want to carry on with your saved game?"):
+            save.close(remove=True)
+            return None
+
+        board = save.board
+        self.minesno = board.minesno
+        self.height = board.grid.rows()
+        self.width = board.grid.cols()
+        self.noguess = board.noguess
+        self.topology = board.grid.topology
+        self.savefile = save
+        return board
+
+    def autosave(self):
+        """Keep the save file up to date with the board"""
+        board = self.field.board
+        if not self.savepath or not self.field.bounded or not board.initialized:
+            return
+        if board.over:
+            if self.savefile is not None:
+                self.savefile.close(remove=True)
+                self.savefile = None
+        elif self.savefile is None:
+            self.savefile = SaveFile.create(self.savepath, board)
+        else:
+            self.savefile.sync()
+
+    def watch(self, replay: Replay, speed: float = 1.0):
+        """Play a replay on the screen, speed 2 is twice as fast"""
+        board = replay.board()
+        self.minesno = board.minesno
+        self.height = board.grid.rows()
+        self.width = board.grid.cols()
+        self.noguess = board.noguess
+        self.topology = board.grid.topology
+        self.endless = False
+        if self.savefile is not None:
+            # the saved game stays there to be carried on later
+            self.savefile.close()
+            self.savefile = None
+        self.savepath = None
+        self.restart(board)
+        # watching isn't playing so it doesn't get a replay of its own
+        self.field.recorder = None
+        self.playback = (iter(replay), speed, None)
+
+    def stepreplay(self):
+        """Do the moves of the watched replay that are due"""
+        moves, speed, due = self.playback
+        now = time.monotonic()
+        # not stopping when the game ends, the player could've undone that
+        while self.playback is not None:
+            if due is None:
+                move = next(moves, None)
+                if move is None:
+                    self.playback = None
+                    return
+                start = now if speed else 0
+                due = (start, move)
+            start, move = due
+            if speed and now < start + move.dt / 1000 / speed:
+                break
+            self.field.playmove(move)
+            due = None
+            now = time.monotonic()
+        if self.playback is not None:
+            # (restarting from the lost/won dialog stops the playback)
+            self.playback = (moves, speed, due)
+
     def update(self):
         """Frame update callback"""
         self.mousepos = pygame.mouse.get_pos()
         if tkwin.active:
-            tkwin.update()
+            with profiler.section("tk"):
+                tkwin.update()
+            # the settings notice is covering the screen
+            self.redrawall()
         else:
-            pygame.display.flip()
+            self.settleresize()
+            self.keypan()
+            if self.playback is not None:
+                self.stepreplay()
             super().update()
+            with profiler.section("flip"):
+                if self.dirtyrects is None:
+                    pygame.display.flip()
+                elif self.dirtyrects:
+                    pygame.display.update(self.dirtyrects)
+
+    def busy(self) -> bool:
+        """Frames only have to keep coming while something moves on its own"""
+        return (
+            tkwin.active
+            or self.playback is not None
+            or profiler.shown
+            or self.keypandir() != (0, 0)
+            or self._resized is not None
+        )
+
+    def settleresize(self):
+        """Adjust to the new window size once it's stopped changing"""
+        if self._resized is None or (time.monotonic() - self._resized) * 1000 < self.resizedelay:
+            return
+        self._resized = None
+        # different adjust functions because buttons
+        # have nothing to do with fields
+        print(self.size)
+        self.adjust()
+        self.field.adjust()
+        self.redrawall()
+
+    def keypandir(self):
+        """Which way the held arrow keys (or WASD) pan the board"""
+        keys = pygame.key.get_pressed()
+        dx = (keys[K_LEFT] or keys[K_a]) - (keys[K_RIGHT] or keys[K_d])
+        dy = (keys[K_UP] or keys[K_w]) - (keys[K_DOWN] or keys[K_s])
+        return dx, dy
+
+    def keypan(self):
+        """Pan the board while the arrow keys (or WASD) are held"""
+        dx, dy = self.keypandir()
+        if dx or dy:
+            self.field.pan(dx * self.panspeed, dy * self.panspeed)
 
     def key_poll(self, event: pygame.event.Event):
         """Callback for clicking events"""
         if event.type == MOUSEBUTTONDOWN:
+            if event.button == 2:
+                # a middle click chords when it's let go without dragging
+                self.middledrag = False
             if self.mdstate == False:
                 self.mdstate = True
                 # TODO: debug this
                 print(event.dict)
                 self.mousedown(pygame.mouse.get_pressed(), self.mousepos)
                 return True
+            elif event.button in (1, 3):
+                # the other button went down while one was held: chord
+                self.mousedown(pygame.mouse.get_pressed(), self.mousepos)
+                return True
         elif event.type == MOUSEBUTTONUP:
             self.mdstate = False
+            if event.button == 2 and not self.middledrag:
+                self.chord(self.mousepos)
 
     def adjust(self):
         """Adjust buttons for screen resize (& other game related things)"""
@@ -80,12 +310,36 @@ class Minesweeper(BasicGame):
     def meta_event_poll(self, event: pygame.event.Event):
         """Event handler for non-clicking (i.e. screen resize)"""
         if event.type == VIDEORESIZE:
+            # the adjusting waits for the resizing to stop (settleresize)
             self.size = event.dict["size"]
-            # different adjust functions because buttons
-            # have nothing to do with fields
-            print(self.size)
-            self.adjust()
-            self.field.adjust()
+            self._resized = time.monotonic()
+        elif event.type == MOUSEMOTION and event.buttons[1]:
+            # dragging with the middle button pans the board
+            self.middledrag = True
+            self.field.pan(*event.rel)
+        elif event.type == MOUSEWHEEL:
+            self.field.zoomat(self.mousepos, self.zoomstep ** event.y)
+        elif event.type == KEYDOWN and event.mod & KMOD_CTRL and event.key in (K_z, K_y):
+            # ctrl+z undoes, ctrl+y (or ctrl+shift+z) redoes
+            if event.key == K_y or event.mod & KMOD_SHIFT:
+                self.field.redo()
+            else:
+                self.field.undo()
+            self.autosave()
+        elif event.type == KEYDOWN and event.key == K_h:
+            # mine chance heatmap
+            self.field.toggleheatmap()
+        elif event.type == KEYDOWN and event.key == K_m:
+            # minimap of boards that don't fit
+            self.field.toggleminimap()
+        elif event.type == KEYDOWN and event.key == K_F3:
+            # frame profiler overlay
+            profiler.shown = not profiler.shown
+            self.redrawall()
+        elif event.type == KEYDOWN and event.key == K_F4:
+            path = time.strftime("trace-%Y%m%d-%H%M%S.json")
+            profiler.export(path)
+            print(f"frame trace written to {path}")
 
     def _inborder(self, pos: Coords, left, right, top, bott) -> bool:
         """Check if a position is inside the pixel boundaries"""
@@ -110,23 +364,22 @@ class Minesweeper(BasicGame):
         """Handle ALL clicking"""
         # opening = left click
         # flagging = right click
-        # middle button is not important
+        # both at once = chord (so does a middle click, see key_poll)
         opening, _, flagging = button
         if self.inrect(pos, self.field) and self.state not in (State.lost, State.won):
             # click handling is delegated to the Field obj (unless the game is over)
-            if opening or flagging:
-                # NOTE: this is a bug w/ pygame or smth idk what it is
-                if opening and flagging:
-                    flagging = False
-
+            if opening and flagging:
+                self.chord(pos)
+            elif opening or flagging:
                 self.field.click(pos, flagging)
+                self.autosave()
         elif self.resbtn.ishovering():
             # runs if the mouse is down AND it's hovering over the restart button
             if self.rconfirm == False:
                 self.rconfirm = True
             else:
                 self.restart()
-        elif self.settbtn.ishovering():
+        elif self.settbtn.ishovering() and tkwin.available:
             # same thing but for the settings button ^^^
             self.screen.fill((232, 232, 232))
             # TODO: do another font because wow I do not like this
@@ -139,6 +392,26 @@ class Minesweeper(BasicGame):
     
             tkwin.activate()
 
+    def generated(self, board: Board):
+        """The first click made the board, say so if it isn't what was asked for"""
+        if self.noguess and not board.noguess:
+            # no board without guesses turned up in time (mod/noguess.py)
+            if dialogs().askyesno("No luck", "Couldn't find a board that can be solved without guessing in time, this one might need a guess. Try another one?"):
+                self.restart()
+            else:
+                # the settings show what this game really is
+                self.noguess = False
+
+    def cantplay(self, reason: str):
+        """The board can't be played, e.g. its mines don't fit"""
+        dialogs().showerror("Can't play this board", reason)
+
+    def chord(self, pos: Coords):
+        """Open everything around a number that has all its flags"""
+        if self.inrect(pos, self.field) and self.state not in (State.lost, State.won):
+            self.field.click(pos, False, chording=True)
+            self.autosave()
+
     def tksubmit(self, code: int):
         """Callback for the tkwin (SettingsWin) object"""
         # code = 1 means the user exited the window via x button
@@ -148,12 +421,24 @@ class Minesweeper(BasicGame):
         mines = tkwin.minesno()
         height = tkwin.height()
         width = tkwin.width()
+        noguess = tkwin.noguess()
+        endless = tkwin.endless()
+        topology = tkwin.topology()
+        code = tkwin.code()
+
+        # a new board code wins over the other settings
+        if code and code != self.field.board.code:
+            self.loadcode(code)
+            return
 
         # for more checks and errors, this code's extendable
         checks = [
             mines != self.minesno,
             height != self.height,
-            width != self.width
+            width != self.width,
+            noguess != self.noguess,
+            topology != self.topology,
+            endless != self.endless
         ]
         if not any(checks):
             tkwin.done()
@@ -161,19 +446,44 @@ class Minesweeper(BasicGame):
 
         errmsg = []
 
-        if mines >= self.field._grid.cellno:
-            errmsg.append(f"Too many mines for the field! (max: {int(self.field._grid.cellno-1)})")
+        if not endless:
+            # the first click keeps a few squares around it free of mines,
+            # more of them on hex and knight boards
+            most = Board.maxmines(width, height, topology)
+            if mines > most:
+                errmsg.append(f"Too many mines for the field! (max: {most})")
 
         if errmsg:
             finalmsg = "We have a few problems:\n - " + "\n - ".join(errmsg)
-            messagebox.showerror("Few problems", finalmsg)
-        elif messagebox.askokcancel("Restarting Game...", "We are going to restart the game with the new settings. Proceed?"):
+            dialogs().showerror("Few problems", finalmsg)
+        elif dialogs().askokcancel("Restarting Game...", "We are going to restart the game with the new settings. Proceed?"):
             tkwin.done()
             self.minesno = mines
             self.height = height
             self.width = width
+            self.noguess = noguess
+            self.topology = topology
+            self.endless = endless
             self.restart()
 
+    def loadcode(self, code: str):
+        """Restart with the board from a board code"""
+        try:
+            board = Board.fromcode(code)
+        except ValueError as e:
+            dialogs().showerror("Bad board code", str(e))
+            return
+
+        if dialogs().askokcancel("Restarting Game...", "We are going to restart the game with the board from the code. Proceed?"):
+            tkwin.done()
+            self.minesno = board.minesno
+            self.height = board.grid.rows()
+            self.width = board.grid.cols()
+            self.noguess = board.noguess
+            self.topology = board.grid.topology
+            self.endless = False
+            self.restart(board)
+
     # TODO:
     #   For these 2 functions, find a way to edit the buttons to clarify that
     #   if you don't restart now you can restart later. E.g. "Do you wanna
@@ -184,7 +494,7 @@ class Minesweeper(BasicGame):
         self.state = State.lost
         self.draw()
         pygame.display.flip()
-        restart = messagebox.askyesno("R.I.P.", "Shame, it's ok though. Do you want to restart *now*?")
+        restart = dialogs().askyesno("R.I.P.", "Shame, it's ok though. Do you want to restart *now*?")
         if restart:
             self.restart()
 
@@ -194,13 +504,13 @@ class Minesweeper(BasicGame):
         # TODO: Do something like google (maybe?) if you do that, uncomment the code under
         # self.draw()
         # pygame.display.flip()
-        restart = messagebox.askyesno("Literally Me", "Wow, you're a literally god(dess) literally the best wow, congrats!!!!! Do you wanna restart?")
+        restart = dialogs().askyesno("Literally Me", "Wow, you're a literally god(dess) literally the best wow, congrats!!!!! Do you wanna restart?")
         if restart:
             self.restart()
 
-    def restart(self):
+    def restart(self, board=None):
         # it's a new function because better naming
-        self.gamesetup()
+        self.gamesetup(board)
 
     def drawmeta(self):
         """Draw meta stuff like the restart and settings button, and the mine counter"""
@@ -211,18 +521,70 @@ class Minesweeper(BasicGame):
             self.resbtn.updateobjs("Restart", btnhoverclr="#4cb5ae")
             self.rconfirm = False
 
+        # the strip above the board only gets redrawn when something on it
+        # changed (the counter, a button's text or the mouse going over one)
+        look = (
+            self.field.flagged, self.resbtn.text,
+            self.resbtn.ishovering(), self.settbtn.ishovering(), self.size
+        )
+        if look == self._metalook:
+            return None
+        self._metalook = look
+
+        strip = pygame.Rect(0, 0, self.w, max(0, min(self.field.top, self.field.screenpos[1])))
+        self.screen.fill(self.bg_color, strip)
+
         self.resbtn.render()
         self.settbtn.render()
 
         # Mine Counter
         # TODO: find better font, this one's blurry
-        textimg = segfont.render(str(self.field.flagged), True, (50, 50, 50))
+        textimg = assets.font(SEGFONT, 20).render(str(self.field.flagged), True, (50, 50, 50))
+        profiler.count("text")
         x = (self.field.minmargin)
         h = (self.field.minmargin/2 - textimg.get_height()/2)
         self.screen.blit(textimg, (x, h))
 
+        return strip
+
     def draw(self):
         """The general draw function"""
-        self.screen.fill(self.bg_color)  # clear screen
-        self.field.draw(self.screen)
-        self.drawmeta()
+        if self._fullredraw:
+            self.screen.fill(self.bg_color)  # clear screen
+            self.field.markall()
+            self._metalook = None
+
+        with profiler.section("field.draw"):
+            rects = self.field.draw(self.screen)
+        with profiler.section("drawmeta"):
+            strip = self.drawmeta()
+        if strip is not None:
+            rects.append(strip)
+        if profiler.shown:
+            rects.append(self.drawprofiler())
+
+        if self._fullredraw:
+            self.dirtyrects = None
+            self._fullredraw = False
+        else:
+            self.dirtyrects = rects
+
+    def drawprofiler(self):
+        """Draw the frame profiler overlay in the bottom left corner"""
+        if self.hudfont is None:
+            self.hudfont = assets.sysfont("Consolas,Courier New,monospace", 14)
+        lines = [self.hudfont.render(line, True, (230, 230, 230)) for line in profiler.lines()]
+        # a fixed width so last frame's text is always fully covered
+        width = max(300, *(img.get_width() for img in lines)) + 8
+        height = sum(img.get_height() for img in lines) + 8
+        rect = pygame.Rect(0, self.h - height, width, height)
+        if rect != self._hudrect:
+            # what was under a bigger overlay has to come back
+            self._hudrect = rect
+            self.redrawall()
+        self.screen.fill((30, 30, 30), rect)
+        y = rect.top + 4
+        for img in lines:
+            self.screen.blit(img, (rect.left + 4, y))
+            y += img.get_height()
+        return rect
@@ -0,0 +1,101 @@
+"""Icons and fonts at the size they're drawn at, kept in a small LRU
+
+Scaling the icons, looking up a system font and loading a font file
+aren't free, and resizing the window or zooming asks for the same few
+sizes over and over. Everything made here is kept by (kind, name, size)
+and the least recently used ones are dropped past `maxsize`, so going
+back to a size is a dict lookup.
+
+Nothing is loaded before it's first asked for, and finding where a
+system font lives (which has pygame look through every font installed)
+is remembered in `fontcache` between runs.
+
+There's one store for the whole game (`assets` at the bottom), like the
+profiler.
+"""
+
+import io
+import json
+import os
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import pygame
+
+class AssetCache:
+    def __init__(self, maxsize: int = 64, fontcache: Optional[str] = ".fontcache.json"):
+        self.maxsize = maxsize
+        self._items: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        # system font name -> its file (None if it isn't installed), None
+        # to not keep it on disk (delete the file after installing fonts)
+        self.fontcache = fontcache
+        self._fontpaths: Optional[Dict[str, Optional[str]]] = None
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key, make):
+        """The asset for key, made with make() if it isn't kept."""
+        items = self._items
+        if key in items:
+            items.move_to_end(key)
+            self.hits += 1
+            return items[key]
+        self.misses += 1
+        value = items[key] = make()
+        if len(items) > self.maxsize:
+            items.popitem(last=False)
+        return value
+
+    def clear(self):
+        self._items.clear()
+
+    def image(self, path: str) -> pygame.Surface:
+        return self.get(("image", path), lambda: pygame.image.load(path))
+
+    def icon(self, path: str, size: int) -> pygame.Surface:
+        """The image at path scaled to a size x size square."""
+        return self.get(
+            ("icon", path, size),
+            lambda: pygame.transform.scale(self.image(path), (size, size))
+        )
+
+    def fontpath(self, name: str) -> Optional[str]:
+        """Where a system font is (None if it isn't there), name can be a
+        comma separated list like for pygame.font.SysFont.
+        """
+        if self._fontpaths is None:
+            self._fontpaths = {}
+            if self.fontcache and os.path.exists(self.fontcache):
+                try:
+                    with open(self.fontcache) as f:
+                        self._fontpaths = json.load(f)
+                except (OSError, ValueError):
+                    pass
+        paths = self._fontpaths
+        if name in paths and (paths[name] is None or os.path.exists(paths[name])):
+            return paths[name]
+
+        paths[name] = pygame.font.match_font(name)
+        if self.fontcache:
+            try:
+                with open(self.fontcache, "w") as f:
+                    json.dump(paths, f, indent=2)
+            except OSError:
+                pass  # it'll just be looked up again next time
+        return paths[name]
+
+    def sysfont(self, name: str, size: int) -> pygame.font.Font:
+        """Like pygame.font.SysFont, pygame's own font if it isn't there."""
+        return self.get(("sysfont", name, size), lambda: pygame.font.Font(self.fontpath(name), size))
+
+    def font(self, path: str, size: int) -> pygame.font.Font:
+        """A font from a file, which is only read from disk once."""
+        def make():
+            data = self.get(("file", path), lambda: open(path, "rb").read())
+            return pygame.font.Font(io.BytesIO(data), size)
+        return self.get(("font", path, size), make)
+
+assets = AssetCache()
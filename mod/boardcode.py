@@ -0,0 +1,71 @@
+"""Board codes, short strings that describe a whole board
+
+A board is fully decided by its size, mine count, first click, seed,
+whether it's a no-guess board and its topology, so that's all a code has
+to hold:
+
+    version (1 byte) | flags (1) | width (2) | height (2) | mines (4)
+    | first x (2) | first y (2) | seed (4)
+
+packed big-endian and written in url-safe base64 (24 characters). The
+topology is kept in the flags (its index in topology.NAMES, shifted past
+the NOGUESS bit) so codes of square boards didn't change.
+"""
+
+import base64
+import binascii
+import struct
+from typing import NamedTuple, Tuple
+
+from .topology import NAMES
+
+VERSION = 1
+_layout = struct.Struct(">BBHHIHHI")
+
+# flags
+NOGUESS = 1
+TOPOLOGYSHIFT = 1
+
+class BoardInfo(NamedTuple):
+    width: int
+    height: int
+    mines: int
+    first: Tuple[int, int]
+    seed: int
+    noguess: bool = False
+    topology: str = "square"
+
+def encode(info: BoardInfo) -> str:
+    """Turn a board's description into a code."""
+    flags = NOGUESS if info.noguess else 0
+    flags |= NAMES.index(info.topology) << TOPOLOGYSHIFT
+    raw = _layout.pack(
+        VERSION, flags,
+        info.width, info.height, info.mines,
+        info.first[0], info.first[1],
+        info.seed & 0xFFFFFFFF
+    )
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+def decode(code: str) -> BoardInfo:
+    """Turn a code back into a board's description.
+
+    Raises ValueError if the code is broken.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(code.strip().encode("ascii"))
+        version, flags, width, height, mines, fx, fy, seed = _layout.unpack(raw)
+    except (binascii.Error, struct.error, UnicodeEncodeError) as e:
+        raise ValueError(f"Not a board code: {code!r}") from e
+
+    if version != VERSION:
+        raise ValueError(f"Unknown board code version {version}")
+    shape = flags >> TOPOLOGYSHIFT
+    if shape >= len(NAMES):
+        raise ValueError(f"Unknown board shape in code: {code!r}")
+    if not (0 <= fx < width and 0 <= fy < height) or mines >= width * height:
+        raise ValueError(f"Board code doesn't make sense: {code!r}")
+
+    return BoardInfo(
+        width, height, mines, (fx, fy), seed, bool(flags & NOGUESS), NAMES[shape]
+    )
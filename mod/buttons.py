@@ -5,13 +5,16 @@ from __future__ import annotations
 import pygame
 from typing import TYPE_CHECKING, Tuple
 
+from .assets import assets
+from .profiler import profiler
+
 if TYPE_CHECKING:
     from ..game import Minesweeper
 
 # this uses an entirely different font obj because the other
 # one adjusts for screensize *according to the size of a tile*
 # which won't do for buttons
-secfont = pygame.font.SysFont("Corbel", 30)
+SECFONT = ("Corbel", 30)
 
 class Button:
     text: str
@@ -55,7 +58,8 @@ class Button:
         updates all the objects (txt, rect) that depend on it.
         """
         self.text = newtxt
-        self.txtsurf = secfont.render(newtxt, True, pygame.Color(self.textclr))
+        self.txtsurf = assets.sysfont(*SECFONT).render(newtxt, True, pygame.Color(self.textclr))
+        profiler.count("text")
         self.rectsurf = self.txtsurf.get_rect()
         if self.pos:
             self.rectsurf.center = self.pos
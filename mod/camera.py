@@ -0,0 +1,138 @@
+"""Camera for looking at a part of the minefield (pan and zoom)
+
+Only does the maths between screen pixels and grid cells so it doesn't
+need pygame. The view is a rect of the screen the board is shown in and
+the offset is where the view's top left corner is on the board, in
+pixels at the current square size.
+
+Hex boards (see mod/topology.py) are drawn like bricks, with every odd
+row pushed half a square to the right, which is what `shift` is for.
+"""
+
+from math import floor
+from typing import Optional, Tuple
+
+class Camera:
+    def __init__(self, minsqrsize: int = 4, maxsqrsize: int = 120):
+        self.minsqrsize = minsqrsize
+        self.maxsqrsize = maxsqrsize
+
+        self.sqrsize = minsqrsize
+        self.view = (0, 0, 0, 0)  # left, top, width, height on the screen
+        self.offset = (0.0, 0.0)
+        # board size in cells, None for endless boards
+        self.cells: Optional[Tuple[int, int]] = None
+        self.shift = False  # push odd rows half a square right
+
+    def setview(self, view, sqrsize, cells=None, shift=False):
+        """Set where the board is shown and center the board in it."""
+        self.view = tuple(int(v) for v in view)
+        self.sqrsize = sqrsize
+        self.cells = cells
+        self.shift = shift
+        if cells is None:
+            self.offset = (-self.view[2] / 2, -self.view[3] / 2)
+        else:
+            self.offset = (0.0, 0.0)
+        self.clamp()
+
+    def clamp(self):
+        """Keep a bounded board in sight. Boards smaller than the view are
+        centered, bigger ones can't be dragged past their edges.
+        """
+        if self.cells is None:
+            return
+        offset = []
+        extra = (self.rowshift(1), 0)
+        for cells, length, off, more in zip(self.cells, self.view[2:], self.offset, extra):
+            size = cells * self.sqrsize + more
+            if size <= length:
+                off = (size - length) / 2
+            else:
+                off = min(max(off, 0), size - length)
+            offset.append(off)
+        self.offset = tuple(offset)
+
+    # CONVERSIONS
+
+    def rowshift(self, y) -> int:
+        """How far row y is pushed right."""
+        return self.sqrsize // 2 if self.shift and y & 1 else 0
+
+    def grid2pixel(self, pos):
+        """Screen pixel of the northwest corner of a cell."""
+        x, y = pos
+        return (
+            self.view[0] + x * self.sqrsize + self.rowshift(y) - self.offset[0],
+            self.view[1] + y * self.sqrsize - self.offset[1]
+        )
+
+    def grid2view(self, pos):
+        """Same as grid2pixel but relative to the view's corner."""
+        x, y = pos
+        return (
+            x * self.sqrsize + self.rowshift(y) - self.offset[0],
+            y * self.sqrsize - self.offset[1]
+        )
+
+    def pixel2grid(self, pos):
+        """The cell under a screen pixel."""
+        x, y = pos
+        row = floor((y - self.view[1] + self.offset[1]) / self.sqrsize)
+        return (
+            floor((x - self.view[0] + self.offset[0] - self.rowshift(row)) / self.sqrsize),
+            row
+        )
+
+    def inview(self, pos) -> bool:
+        """Is a screen pixel inside the view?"""
+        x, y = pos
+        left, top, w, h = self.view
+        return left <= x < left + w and top <= y < top + h
+
+    def visible(self):
+        """The (left, top, right, bottom) cells that touch the view, inclusive."""
+        sq = self.sqrsize
+        ox, oy = self.offset
+        # with shifted rows the cell left of the view can poke into it
+        left, top = floor((ox - self.rowshift(1)) / sq), floor(oy / sq)
+        right = floor((ox + self.view[2] - 1) / sq)
+        bottom = floor((oy + self.view[3] - 1) / sq)
+        if self.cells is not None:
+            left, top = max(left, 0), max(top, 0)
+            right = min(right, self.cells[0] - 1)
+            bottom = min(bottom, self.cells[1] - 1)
+        return left, top, right, bottom
+
+    def itervisible(self):
+        """Iterate the cells that touch the view."""
+        left, top, right, bottom = self.visible()
+        for y in range(top, bottom + 1):
+            for x in range(left, right + 1):
+                yield (x, y)
+
+    # MOVING
+
+    def pan(self, dx, dy):
+        """Move the board by (dx, dy) screen pixels."""
+        self.offset = (self.offset[0] - dx, self.offset[1] - dy)
+        self.clamp()
+
+    def zoom(self, factor, anchor) -> bool:
+        """Scale the squares by factor, keeping the cell under the screen
+        pixel anchor where it is. Returns whether the size changed.
+        """
+        new = round(self.sqrsize * factor)
+        if new == self.sqrsize:
+            new += 1 if factor > 1 else -1
+        new = min(max(new, self.minsqrsize), self.maxsqrsize)
+        if new == self.sqrsize:
+            return False
+
+        ax, ay = anchor[0] - self.view[0], anchor[1] - self.view[1]
+        wx = (ax + self.offset[0]) / self.sqrsize
+        wy = (ay + self.offset[1]) / self.sqrsize
+        self.sqrsize = new
+        self.offset = (wx * new - ax, wy * new - ay)
+        self.clamp()
+        return True
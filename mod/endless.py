@@ -0,0 +1,267 @@
+"""Endless minefield, made up one chunk at a time
+
+The board has no edges. It's cut into square chunks and the mines of a
+chunk only depend on the board's seed and the chunk's coordinates, so a
+chunk can be thrown away and made again exactly the same. Chunks are only
+made when a reveal (or the screen) reaches them and the least recently
+used ones are dropped once there are too many. A dropped chunk only keeps
+what the player did to it (uncovered squares and flags), everything else
+is derived again when it comes back, so memory grows with the explored
+area and not with the size of the board.
+"""
+
+from __future__ import annotations
+
+import random
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from .engine import State
+from .grid import Grid
+
+Cell = Tuple[int, int]
+
+class Chunk:
+    """A materialized chunk, all layers are chunksize*chunksize bytes."""
+
+    def __init__(self, mine: bytes, count: bytes, uncovered: bytearray, flag: bytearray):
+        self.mine = mine
+        self.count = count
+        self.uncovered = uncovered
+        self.flag = flag
+
+class EndlessBoard:
+    # below this density the empty squares could join up into one
+    # opening that never ends
+    mindensity = 0.1
+
+    def __init__(
+        self,
+        density: float = 0.16,
+        seed=None,
+        chunksize: int = 32,
+        maxchunks: int = 256,
+        maxreveal: int = 250_000
+    ):
+        self.density = max(density, self.mindensity)
+        self.seed = seed if seed is not None else random.getrandbits(32)
+        self.chunksize = chunksize
+        self.maxchunks = maxchunks  # materialized chunks kept in memory
+        self.maxreveal = maxreveal  # cap on a single forest fire
+
+        self._chunks: "OrderedDict[Cell, Chunk]" = OrderedDict()
+        # (uncovered, flag) of chunks that got dropped
+        self._saved: Dict[Cell, Tuple[bytes, bytes]] = {}
+        # mine layers of chunks around materialized ones (for the counts)
+        self._mines: "OrderedDict[Cell, bytes]" = OrderedDict()
+
+        self.first: Optional[Cell] = None
+        self.target: Optional[Cell] = None
+        self.flags = 0  # flags on the board
+        self.revealed = 0  # uncovered squares, the score
+        self.state = State.playing
+
+    @property
+    def initialized(self) -> bool:
+        return self.first is not None
+
+    @property
+    def over(self) -> bool:
+        return self.state is State.lost
+
+    @property
+    def code(self):
+        # board codes only describe normal boards
+        return None
+
+    @property
+    def loaded(self) -> int:
+        """Number of materialized chunks."""
+        return len(self._chunks)
+
+    # CHUNKS
+
+    def chunkof(self, cell: Cell) -> Tuple[Cell, int]:
+        """The chunk a cell is in and its index inside the chunk."""
+        x, y = cell
+        cs = self.chunksize
+        cx, lx = divmod(x, cs)
+        cy, ly = divmod(y, cs)
+        return (cx, cy), ly * cs + lx
+
+    def minesof(self, key: Cell) -> bytes:
+        """The mine layer of a chunk, only derived from the seed."""
+        mines = self._mines.get(key)
+        if mines is not None:
+            self._mines.move_to_end(key)
+            return mines
+
+        cs = self.chunksize
+        rng = random.Random(f"{self.seed}:{key[0]}:{key[1]}")
+        threshold = round(256 * self.density)
+        table = bytes(1 if b < threshold else 0 for b in range(256))
+        layer = bytearray(rng.randbytes(cs * cs).translate(table))
+
+        # nothing around the first click, like on a normal board
+        if self.first is not None:
+            fx, fy = self.first
+            ox, oy = key[0] * cs, key[1] * cs
+            for y in range(max(fy - 2, oy), min(fy + 3, oy + cs)):
+                for x in range(max(fx - 2, ox), min(fx + 3, ox + cs)):
+                    layer[(y - oy) * cs + (x - ox)] = 0
+
+        mines = bytes(layer)
+        self._mines[key] = mines
+        if len(self._mines) > 4 * self.maxchunks:
+            self._mines.popitem(last=False)
+        return mines
+
+    def chunk(self, key: Cell) -> Chunk:
+        """Get a chunk, materializing it if it isn't in memory."""
+        chunk = self._chunks.get(key)
+        if chunk is not None:
+            self._chunks.move_to_end(key)
+            return chunk
+
+        cs = self.chunksize
+        cx, cy = key
+        # the counts need the mines around the chunk too, so lay the 3x3
+        # chunks' edges around it and count them all in one go
+        padded = Grid(cs + 2, cs + 2)
+        pmine = padded.layer("mine")
+        for dy in (-1, 0, 1):
+            for dx in (-1, 0, 1):
+                mines = self.minesof((cx + dx, cy + dy))
+                for ly in range(cs):
+                    py = ly + 1 + dy * cs
+                    if not 0 <= py < cs + 2:
+                        continue
+                    for lx in range(cs):
+                        px = lx + 1 + dx * cs
+                        if 0 <= px < cs + 2:
+                            pmine[py * (cs + 2) + px] = mines[ly * cs + lx]
+        padded.recount()
+        pcount = padded.layer("count")
+        count = b"".join(
+            pcount[(ly + 1) * (cs + 2) + 1:(ly + 1) * (cs + 2) + 1 + cs]
+            for ly in range(cs)
+        )
+
+        saved = self._saved.pop(key, None)
+        if saved is not None:
+            uncovered, flag = bytearray(saved[0]), bytearray(saved[1])
+        else:
+            uncovered, flag = bytearray(cs * cs), bytearray(cs * cs)
+
+        chunk = Chunk(self.minesof(key), count, uncovered, flag)
+        self._chunks[key] = chunk
+        self._evict()
+        return chunk
+
+    def _evict(self):
+        """Drop the least recently used chunks, keeping the player's work."""
+        while len(self._chunks) > self.maxchunks:
+            key, chunk = self._chunks.popitem(last=False)
+            if any(chunk.uncovered) or any(chunk.flag):
+                self._saved[key] = (bytes(chunk.uncovered), bytes(chunk.flag))
+
+    def touch(self, left: int, top: int, right: int, bottom: int):
+        """Materialize the chunks under a rect of cells (e.g. the screen).
+
+        Skipped when they wouldn't all fit in memory at once, they'd only
+        push each other out again.
+        """
+        cs = self.chunksize
+        if (right // cs - left // cs + 1) * (bottom // cs - top // cs + 1) > self.maxchunks:
+            return
+        for cy in range(top // cs, bottom // cs + 1):
+            for cx in range(left // cs, right // cs + 1):
+                self.chunk((cx, cy))
+
+    # CELLS
+
+    def get(self, cell: Cell):
+        """Same tuple as Grid.get: (mined, uncovered, mines, flagged)."""
+        key, i = self.chunkof(cell)
+        c = self.chunk(key)
+        return (c.mine[i], c.uncovered[i], c.count[i], c.flag[i])
+
+    @staticmethod
+    def iterneighbours(cell: Cell):
+        x, y = cell
+        for dy in (-1, 0, 1):
+            for dx in (-1, 0, 1):
+                if dx or dy:
+                    yield (x + dx, y + dy)
+
+    # PLAYING
+
+    def click(self, cell: Cell, flagging=False) -> List[Cell]:
+        """Open (or flag) a cell, returns the cells whose look changed."""
+        if self.over:
+            return []
+        if self.first is None:
+            # the mines are derived lazily so nothing's been made yet
+            self.first = cell
+            self._chunks.clear()
+            self._mines.clear()
+
+        if flagging:
+            return self.flag(cell)
+        return self.open(cell)
+
+    def flag(self, cell: Cell) -> List[Cell]:
+        key, i = self.chunkof(cell)
+        c = self.chunk(key)
+        if c.uncovered[i]:
+            return []
+        c.flag[i] ^= 1
+        self.flags += 1 if c.flag[i] else -1
+        return [cell]
+
+    def open(self, cell: Cell) -> List[Cell]:
+        key, i = self.chunkof(cell)
+        c = self.chunk(key)
+        if c.uncovered[i] or c.flag[i]:
+            return []
+        if c.mine[i]:
+            self.target = cell
+            self.state = State.lost
+            return [cell]
+
+        c.uncovered[i] = 1
+        self.revealed += 1
+        changed = [cell]
+        if c.count[i] == 0:
+            changed += self.forestfires(cell)
+        return changed
+
+    def forestfires(self, start: Cell) -> List[Cell]:
+        """Clear the opening around an empty cell, chunk by chunk.
+
+        Stops after maxreveal squares, the covered empty squares on the edge
+        can be clicked to carry on.
+        """
+        revealed = []
+        seen = {start}
+        stack = [start]
+        while stack and len(revealed) < self.maxreveal:
+            pos = stack.pop()
+            for nb in self.iterneighbours(pos):
+                if nb in seen:
+                    continue
+                seen.add(nb)
+                key, i = self.chunkof(nb)
+                c = self.chunk(key)
+                if c.uncovered[i]:
+                    continue
+                if c.flag[i]:
+                    # they can't be on mines
+                    c.flag[i] = 0
+                    self.flags -= 1
+                c.uncovered[i] = 1
+                self.revealed += 1
+                revealed.append(nb)
+                if c.count[i] == 0:
+                    stack.append(nb)
+        return revealed
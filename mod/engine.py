@@ -0,0 +1,385 @@
+"""The rules of the game, without anything to do with drawing it
+
+Nothing in here imports pygame or tkinter so a board can be played
+from a test, a batch job or a server just as well as from the window.
+"""
+
+import random
+from array import array
+from enum import Enum
+from typing import NamedTuple, Tuple
+
+from . import boardcode
+from .grid import Grid
+from .openings import Openings
+from .topology import around
+
+# just state instead of GameState for simplicity
+class State(Enum):
+    startscreen = 0
+    playing = 1
+    lost = 2
+    won = 3
+
+class Step(NamedTuple):
+    """What's needed to take a move back, only as big as what it changed."""
+    kind: str  # "open", "flag" or "chord"
+    cell: Tuple[int, int]
+    changed: array  # flat indices the move changed
+    cleared: array  # flags the move took off
+    before: tuple  # (flagged, correctsquares, state, target) before the move
+
+class Board:
+    def __init__(
+        self,
+        width: int,
+        height: int,
+        mines: int = 20,
+        noguess: bool = False,
+        seed=None,
+        topology: str = "square"
+    ):
+        # Every attribute of a cell is stored in its own array,
+        # refer to the data guide in mod/grid.py
+        # the topology decides which cells are neighbours (mod/topology.py)
+        # The grid gets swapped for one on the save file when the board is
+        # saved (mod/save.py), so anything that keeps the board should go
+        # through board.grid instead of holding on to the grid
+        self.grid = Grid(width, height, topology=topology)
+
+        # All mineless squares uncovered add to the counter
+        # All mined squares flagged add to the counter
+        # Other states do not
+        self.correctsquares = 0
+        self.flagged = mines  # for the mine counter, is subtrated from over time
+        self.minesno = mines  # num o' mines
+
+        self.target = None  # the mine they clicked and lost
+        # the board isn't initialized until the first click to guarantee
+        # the player doesn't immediately click on a mine
+        self.initialized = False
+        # only make boards that can be solved without guessing
+        self.noguess = noguess
+        # the board's openings, labelled when they're first needed after
+        # the first click (see self.forestfires)
+        self._openings = None
+
+        # the seed and the first click decide the whole board, so they're
+        # all that's needed to make the same board again (see self.code)
+        self.exactseed = seed is not None
+        self.seed = seed if seed is not None else random.getrandbits(32)
+        self.first = None
+
+        self.state = State.playing
+
+        # undo/redo: every move keeps the old values of just the cells it
+        # changed, and redo plays the (kind, cell) moves again
+        self.undos = []
+        self.redos = []
+        self._cleared = []  # flags the move being played took off
+
+    @property
+    def over(self) -> bool:
+        return self.state in (State.lost, State.won)
+
+    def safezone(self, cell):
+        """The cells kept free of mines on the first click: the cell,
+        its neighbours and their neighbours.
+
+        If the mines wouldn't fit around all of that it's cut down to the
+        cell and its neighbours, and then to just the cell.
+        """
+        listt = [cell]
+        ncells = list(self.grid.iterneighbours(cell))
+        zones = [[cell], [cell] + ncells]
+        listt += ncells
+        for i in ncells:
+            listt += list(self.grid.iterneighbours(i))
+        zones.append(list(set(listt)))
+
+        for zone in reversed(zones):
+            if self.grid.cellno - len(zone) >= self.minesno:
+                return zone
+        return zones[0]
+
+    @staticmethod
+    def maxmines(width, height, topology="square") -> int:
+        """The most mines a board can have with the whole safe zone of
+        any first click still free of them.
+        """
+        def zone(x, y):
+            # like safezone, from the moves so no board or table is made
+            i = y * width + x
+            cells = {i}
+            for j in around(topology, width, height, i):
+                cells.add(j)
+                cells.update(around(topology, width, height, j))
+            return len(cells)
+
+        # a zone only depends on how close the cell is to the edges (and
+        # the row being odd for hex), so the cells near the edges and one
+        # in the middle are all the kinds there are
+        xs = {*range(min(width, 5)), *range(max(width - 5, 0), width), width // 2}
+        ys = {*range(min(height, 5)), *range(max(height - 5, 0), height), height // 2, height // 2 + 1}
+        biggest = max(
+            (zone(x, y) for x in xs for y in ys if x < width and y < height),
+            default=0
+        )
+        return max(width * height - biggest, 0)
+
+    def initialize(self, theexempt, rng=random):
+        """Setup all the mines in the board."""
+        self.grid.place_mines(self.minesno, theexempt, rng)
+        self.grid.recount()
+        self._openings = None
+        self.initialized = True
+
+    def setmines(self, layout):
+        """Setup the board from a finished mine layer (a byte per cell)."""
+        self.grid.layer("mine")[:] = layout
+        self.grid.recount()
+        self._openings = None
+        self.initialized = True
+
+    @property
+    def openings(self) -> Openings:
+        """The openings of the board (see mod/openings.py)."""
+        if self._openings is None:
+            self._openings = Openings(self.grid)
+        return self._openings
+
+    @classmethod
+    def fromcode(cls, code: str) -> "Board":
+        """Make the board a code describes, with its first click done.
+
+        Raises ValueError if the code is broken.
+        """
+        info = boardcode.decode(code)
+        board = cls(
+            info.width, info.height, info.mines, info.noguess, info.seed,
+            info.topology
+        )
+        board.click(info.first)
+        return board
+
+    @property
+    def code(self):
+        """The board code of this board (None until the first click)."""
+        if not self.initialized or self.first is None:
+            return None
+        return boardcode.encode(boardcode.BoardInfo(
+            self.grid.cols(), self.grid.rows(), self.minesno,
+            self.first, self.seed, self.noguess, self.grid.topology
+        ))
+
+    def generate(self, cell):
+        """Setup the mines for a first click on cell."""
+        self.first = cell
+        if self.noguess:
+            from .noguess import generate
+            res = generate(
+                self.grid.cols(), self.grid.rows(), self.minesno, cell,
+                seed=self.seed, exact=self.exactseed,
+                topology=self.grid.topology
+            )
+            # the seed of the candidate that worked is the one to share
+            self.seed = res.seed
+            self.noguess = res.solvable
+            self.setmines(res.layout)
+        else:
+            self.initialize(self.safezone(cell), random.Random(self.seed))
+
+    def forestfires(self, pos):
+        """Clears all neighbouring empty squares if an empty square was
+        clicked. Thus, a forest fire.
+
+        Returns the flat indices of every square it uncovered.
+        """
+        i = self.grid.index(pos)
+        if self._openings is None and not self.undos:
+            # the first click: one flood fill is a lot quicker than
+            # labelling the whole board, that waits for the next big reveal
+            # (or the 3BV)
+            revealed = self.grid.flood(i)
+            self._clearflags(revealed)
+            return revealed
+        k = self.openings.of(i)
+        if k < 0:
+            # not an empty square, nothing to spread to
+            revealed = self.grid.flood(i)
+        else:
+            revealed = self.openings.reveal(self.grid, [k])
+        self._clearflags(revealed)
+        return revealed
+
+    def _clearflags(self, revealed):
+        # Remove all their flags (they can't be on mines)
+        flags = self.grid.layer("flag")
+        for i in revealed:
+            if flags[i]:
+                flags[i] = 0
+                self.flagged += 1
+                self._cleared.append(i)
+
+    def click(self, cell, flagging=False):
+        """Open (or flag) a cell.
+
+        Returns the flat indices of every cell whose look changed, the
+        outcome is left in self.state.
+        """
+        if self.over or not self.grid.inbounds(cell):
+            return []
+
+        # decides the positions of all the mines on the first click
+        if not self.initialized:
+            self.generate(cell)
+
+        changed = self._move("flag" if flagging else "open", cell)
+        if changed:
+            # a new move and the taken back ones don't mix
+            self.redos.clear()
+        return changed
+
+    def _move(self, kind, cell):
+        """Play a move and remember how to take it back."""
+        before = (self.flagged, self.correctsquares, self.state, self.target)
+        self._cleared = []
+        if kind == "flag":
+            changed = self.flag(cell)
+        elif kind == "open":
+            changed = self.open(cell)
+        else:
+            changed = self._chord(cell)
+        if changed:
+            self.undos.append(Step(kind, cell, array("i", changed), array("i", self._cleared), before))
+        return changed
+
+    def undo(self):
+        """Take back the last move (even a losing one).
+
+        Only the cells the move changed are touched. The mines stay where
+        they are, even when the first click is taken back. Returns the flat
+        indices that changed.
+        """
+        if not self.undos:
+            return []
+        step = self.undos.pop()
+        unc, flags = self.grid.layer("uncovered"), self.grid.layer("flag")
+        if step.kind == "flag":
+            flags[self.grid.index(step.cell)] ^= 1
+        else:
+            for i in step.changed:
+                unc[i] = 0
+            for i in step.cleared:
+                flags[i] = 1
+        self.flagged, self.correctsquares, self.state, self.target = step.before
+        self.redos.append((step.kind, step.cell))
+        return list(step.changed)
+
+    def redo(self):
+        """Play the last move that was taken back again."""
+        if not self.redos or self.over:
+            return []
+        return self._move(*self.redos.pop())
+
+    def flag(self, cell):
+        """Toggle the flag on a covered cell."""
+        mined, uncovered, _, flagged = self.grid.get(cell)
+        # ignore already uncovered squares
+        if uncovered:
+            return []
+
+        if not flagged:
+            flagged = 1
+            self.flagged -= 1
+            if mined:
+                self.correctsquares += 1
+        else:
+            flagged = 0
+            self.flagged += 1
+            if mined:
+                self.correctsquares -= 1
+        self.grid.setflagged(cell, flagged)
+
+        self._checkwon()
+        return [self.grid.index(cell)]
+
+    def open(self, cell):
+        """Uncover a cell, clearing the area around it if it's empty."""
+        mined, uncovered, mines, flagged = self.grid.get(cell)
+        if uncovered or flagged:
+            return []
+
+        if mined:
+            self.target = cell
+            self.state = State.lost
+            return [self.grid.index(cell)]
+
+        self.grid.setuncovered(cell)
+        changed = [self.grid.index(cell)]
+        if mines == 0:
+            # empty square, so clear neighbours
+            changed += self.forestfires(cell)
+
+        self._checkwon()
+        return changed
+
+    def chord(self, cell):
+        """Chording: clicking a number with all its mines flagged opens
+        every other square around it.
+
+        The squares are all opened in one go, with a single flood fill
+        for every empty one among them. If a flag was wrong the first
+        mine hit loses the game. Returns the changed flat indices.
+        """
+        if self.over or not self.initialized or not self.grid.inbounds(cell):
+            return []
+        changed = self._move("chord", cell)
+        if changed:
+            self.redos.clear()
+        return changed
+
+    def _chord(self, cell):
+        grid = self.grid
+        i = grid.index(cell)
+        unc, cnt = grid.layer("uncovered"), grid.layer("count")
+        flags, mine = grid.layer("flag"), grid.layer("mine")
+        if not unc[i] or not cnt[i]:
+            return []
+
+        around = grid.neighbours(i)
+        if sum(flags[j] for j in around) != cnt[i]:
+            return []
+        toopen = [j for j in around if not unc[j] and not flags[j]]
+
+        for j in toopen:
+            if mine[j]:
+                self.target = grid.pos(j)
+                self.state = State.lost
+                return [j]
+
+        for j in toopen:
+            unc[j] = 1
+        empty = [j for j in toopen if cnt[j] == 0]
+        changed = toopen
+        if empty:
+            openings = self.openings
+            revealed = openings.reveal(grid, [openings.of(j) for j in empty])
+            self._clearflags(revealed)
+            changed = toopen + revealed
+
+        self._checkwon()
+        return changed
+
+    def threebv(self) -> int:
+        """The board's 3BV: the least number of clicks needed to uncover it.
+
+        Every opening (connected area of empty squares, border included)
+        counts as one click and so does every number outside of them.
+        Worked out with the openings (labelled now if they weren't yet).
+        """
+        return self.openings.threebv
+
+    def _checkwon(self):
+        if self.correctsquares == self.minesno:
+            self.state = State.won
@@ -6,7 +6,9 @@ if os.name == 'nt':
     os.environ['SDL_VIDEODRIVER'] = 'windib'
 
 import pygame
-from pygame.locals import RESIZABLE, QUIT
+from pygame.locals import RESIZABLE, QUIT, NOEVENT
+
+from .profiler import profiler
 
 class BasicGame:
     def __init__(self, size=(500, 500), fill=(255, 255, 255)):
@@ -17,6 +19,10 @@ class BasicGame:
         self.clock = pygame.time.Clock() #to track FPS
         self.size = size
         self.fps = 0
+        # when nothing's going on the loop sleeps until there's input,
+        # but never longer than this (ms)
+        self.idletimeout = 500
+        self._waited = None  # the event that woke the loop up
 
     @property
     def w(self):
@@ -27,26 +33,53 @@ class BasicGame:
         return self.size[1]
 
     def handle_events(self):
-        for event in pygame.event.get():
-            if event.type == QUIT:
-                self.running = False
-            self.key_poll(event)
-            self.meta_event_poll(event)
+        with profiler.section("events"):
+            events = pygame.event.get()
+            if self._waited is not None:
+                events.insert(0, self._waited)
+                self._waited = None
+            for event in events:
+                if event.type == QUIT:
+                    self.running = False
+                self.key_poll(event)
+                self.meta_event_poll(event)
 
     def mainloop(self, fps=0):
         self.running = True
         self.fps = fps
 
+        caption = None
         while self.running:
             try:
-                pygame.display.set_caption(f"FPS: {round(self.clock.get_fps())}")
-                self.update()
-                self.clock.tick(self.fps)
+                newcaption = f"FPS: {round(self.clock.get_fps())}"
+                if newcaption != caption:
+                    caption = newcaption
+                    pygame.display.set_caption(caption)
+
+                if self.busy():
+                    self.update()
+                    with profiler.section("tick"):
+                        self.clock.tick(self.fps)
+                else:
+                    # nothing to do until the player does something
+                    with profiler.section("wait"):
+                        event = pygame.event.wait(self.idletimeout)
+                    if event.type != NOEVENT:
+                        self._waited = event
+                    self.update()
+                    self.clock.tick()
+                profiler.endframe()
             except KeyboardInterrupt:
                 self.running = False
 
         pygame.quit()
 
+    def busy(self) -> bool:
+        """Does the next frame have to come right away? (something's
+        moving without the player doing anything, e.g. a held key)
+        """
+        return False
+
     def update(self):
         self.handle_events()
         self.draw()
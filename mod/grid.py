@@ -1,50 +1,414 @@
 """Grid object used for the minefield"""
 
+import random
+from functools import partial
+
+from . import topology as topologies
+
+# DATA GUIDE:
+#   Every attribute of a cell lives in its own flat array (row-major,
+#   index = y * width + x) instead of a tuple per cell:
+#     _mine      - Does this square have a mine?      (0/1 byte)
+#     _uncovered - Is this square uncovered?           (0/1 byte)
+#     _count     - How many mines are around it?       (uint8)
+#     _flag      - Is this square flagged?             (0/1 byte)
+#   The layers are byte-per-cell bitmaps so a single cell is one index
+#   away and a whole layer can be read/written with slice assignments.
+#   get()/set() still speak the old (mined, uncovered, mines, flagged)
+#   tuple so older code keeps working.
+#
+#   Which cells are neighbours depends on the topology (see
+#   mod/topology.py), every topology is served from one precomputed
+#   neighbour table. Plain square boards also have faster paths for
+#   counting and flooding that don't need it.
+
+# boards bigger than this work out neighbours with arithmetic instead of
+# building a table (6-8 ints per cell adds up)
+TABLELIMIT = 1 << 18
+
 class Grid:
-    def __init__(self, width, height, default):
-        self._grid = [[default for i in range(width)] for j in range(height)]
+    def __init__(self, width, height, default=(0, 0, 0, 0), topology="square"):
+        self._width = width
+        self._height = height
+        topologies.get(topology)  # complain early about a typo
+        self.topology = topology
+        self._table = None
+        self._edges = None  # recount's row edge masks
+
+        mined, uncovered, mines, flagged = default
+        n = width * height
+        self._mine = bytearray([mined]) * n
+        self._uncovered = bytearray([uncovered]) * n
+        self._count = bytearray([mines]) * n
+        self._flag = bytearray([flagged]) * n
+
+    @classmethod
+    def frombuffers(cls, width, height, mine, uncovered, count, flag, topology="square"):
+        """Make a grid around existing layers without copying them."""
+        grid = cls(0, 0, topology=topology)
+        grid._width = width
+        grid._height = height
+        grid.setlayers(mine, uncovered, count, flag)
+        return grid
 
     @property
     def cellno(self):
-        return self.cols() * self.rows()
+        return self._width * self._height
 
     def __str__(self):
         out = ""
-        for row in self._grid:
-            out += str(row) +"\n"
+        for y in range(self._height):
+            out += str([self.get((x, y)) for x in range(self._width)]) + "\n"
         return out
 
     def __iter__(self):
-        for y in range(len(self._grid)):
-            for x in range(len(self._grid[y])):
+        for y in range(self._height):
+            for x in range(self._width):
                 yield (x, y)
 
+    # INDEXING
+
+    def index(self, pos):
+        """Convert (x, y) to the flat index used by the layers."""
+        x, y = pos
+        return y * self._width + x
+
+    def pos(self, i):
+        """Convert a flat index back to (x, y)."""
+        y, x = divmod(i, self._width)
+        return (x, y)
+
+    def inbounds(self, pos):
+        """Is (x, y) inside the grid?"""
+        x, y = pos
+        return 0 <= x < self._width and 0 <= y < self._height
+
+    # COMPATIBILITY LAYER
+
     def get(self, pos):
         """Get the values of given coordinates on the grid."""
-        x, y = pos
-        # TODO: assuming this is dangerous (!!!)
-        return self._grid[y][x]
+        i = self.index(pos)
+        return (self._mine[i], self._uncovered[i], self._count[i], self._flag[i])
 
     def set(self, pos, value):
         """Set the value of a cell. Refer to the data guide."""
-        x, y = pos
-        self._grid[y][x] = value
-    
+        i = self.index(pos)
+        self._mine[i], self._uncovered[i], self._count[i], self._flag[i] = value
+
     def set_all(self, value):
         #set all cells to the given value
-        for x, y in self:
-            self.set((x, y), value)
-    
+        mined, uncovered, mines, flagged = value
+        self.fill("mine", mined)
+        self.fill("uncovered", uncovered)
+        self.fill("count", mines)
+        self.fill("flag", flagged)
+
+    # PER-ATTRIBUTE ACCESS
+
+    def ismine(self, pos):
+        return self._mine[self.index(pos)]
+
+    def isuncovered(self, pos):
+        return self._uncovered[self.index(pos)]
+
+    def count(self, pos):
+        return self._count[self.index(pos)]
+
+    def setuncovered(self, pos, val=1):
+        self._uncovered[self.index(pos)] = val
+
+    def setflagged(self, pos, val=1):
+        self._flag[self.index(pos)] = val
+
+    # BULK OPERATIONS
+
+    def layer(self, name):
+        """Return the raw array for one attribute ("mine", "uncovered", "count", "flag")."""
+        return getattr(self, "_" + name)
+
+    def fill(self, name, value):
+        """Set one attribute of every cell to value."""
+        arr = self.layer(name)
+        arr[:] = bytes([value]) * len(arr)
+
+    def setlayers(self, mine, uncovered, count, flag):
+        """Swap the layers for other buffers of the same size (e.g. views
+        into a memory-mapped save, see mod/save.py).
+        """
+        for arr in (mine, uncovered, count, flag):
+            if len(arr) != self.cellno:
+                raise ValueError(f"Layer of {len(arr)} cells for a grid of {self.cellno}")
+        self._mine, self._uncovered, self._count, self._flag = mine, uncovered, count, flag
+
+    def total(self, name):
+        """Number of cells with a non-zero value for the given attribute."""
+        arr = self.layer(name)
+        if isinstance(arr, memoryview):
+            # no count() on those
+            arr = arr.tobytes()
+        return len(arr) - arr.count(0)
+
+    # GENERATION
+
+    def place_mines(self, amount, exempt=(), rng=random):
+        """Put exactly `amount` mines on the grid, avoiding the exempt cells.
+
+        Every allowed cell first gets a mine with probability amount/allowed
+        (one randbytes() call pushed through a lookup table), then the few
+        cells the coin flips got wrong are added/removed at random. Both
+        steps treat every allowed cell the same so each layout is still
+        equally likely, and nothing is ever retried.
+        """
+        n = self.cellno
+        exempt = {self.index(pos) for pos in exempt if self.inbounds(pos)}
+        allowed = n - len(exempt)
+        if amount > allowed:
+            raise ValueError(f"Can't place {amount} mines in {allowed} free cells")
+
+        threshold = round(256 * amount / allowed) if allowed else 0
+        table = bytes(1 if b < threshold else 0 for b in range(256))
+        mine = bytearray(rng.randbytes(n).translate(table))
+        # exempt cells are marked with a 2 so the fix up never touches them
+        for i in exempt:
+            mine[i] = 2
+
+        placed = mine.count(1)
+        if placed > amount:
+            self._flip(mine, 1, placed - amount, rng)
+        elif placed < amount:
+            self._flip(mine, 0, amount - placed, rng)
+
+        for i in exempt:
+            mine[i] = 0
+        self._mine[:] = mine
+
+    @staticmethod
+    def _flip(arr, val, amount, rng, chunk=64):
+        """Flip `amount` random cells equal to val (0/1) to the other value."""
+        counts = [arr.count(val, s, s + chunk) for s in range(0, len(arr), chunk)]
+        ranks = sorted(rng.sample(range(sum(counts)), amount))
+
+        found = []
+        ci = base = 0
+        for r in ranks:
+            # skip to the chunk holding the r-th matching cell...
+            while base + counts[ci] <= r:
+                base += counts[ci]
+                ci += 1
+            # ...and find it inside the chunk
+            j = ci * chunk
+            for _ in range(r - base + 1):
+                j = arr.find(val, j) + 1
+            found.append(j - 1)
+
+        for i in found:
+            arr[i] = 1 - val
+
+    def recount(self):
+        """Recompute the neighbour count of every cell in one pass.
+
+        This is a 3x3 convolution over the mine layer. The layer is read as one
+        big integer with a byte per cell, so shifting it by 8 bits moves every
+        cell by one column and adding two of them adds every cell at once
+        (a count never goes above 8 so no byte carries into the next one).
+        Mined cells get a count of 0 like before.
+
+        Other topologies go through the neighbour table instead.
+        """
+        w, n = self._width, self.cellno
+        if n == 0:
+            return
+        if self.topology != "square":
+            self._tablerecount()
+            return
+
+        mines = int.from_bytes(self._mine, "little")
+        # masks to stop a row's edge from leaking into the next/previous row,
+        # they only depend on the size so they're kept for the next recount
+        if self._edges is None:
+            self._edges = (
+                int.from_bytes((b"\x00" + b"\x01" * (w - 1)) * self._height, "little"),
+                int.from_bytes((b"\x01" * (w - 1) + b"\x00") * self._height, "little"),
+            )
+        notfirst, notlast = self._edges
+
+        # horizontal pass: cell + left + right
+        left = (mines & notlast) << 8    # x-1 contributes to x
+        right = (mines & notfirst) >> 8  # x+1 contributes to x
+        horiz = mines + left + right
+
+        # vertical pass: the rows above and below, plus the row itself
+        # without the cell in the middle
+        row = 8 * w
+        total = (horiz << row) + (horiz >> row) + left + right
+
+        allbytes = (1 << (8 * n)) - 1
+        total &= allbytes  # drop what was shifted past the last row
+        total &= allbytes ^ (mines * 0xFF)  # zero the mined cells
+
+        self._count[:] = total.to_bytes(n, "little")
+
+    def _tablerecount(self):
+        around = self.neighbourfn()
+        mine = bytes(self._mine)
+        counts = bytearray(self.cellno)
+        i = mine.find(1)
+        while i != -1:
+            for j in around(i):
+                counts[j] += 1
+            i = mine.find(1, i + 1)
+        # zero the mined cells (like recount)
+        n = self.cellno
+        keep = ((1 << (8 * n)) - 1) ^ (int.from_bytes(mine, "little") * 0xFF)
+        self._count[:] = (int.from_bytes(counts, "little") & keep).to_bytes(n, "little")
+
+    # REVEALING
+
+    def flood(self, start):
+        """Uncover the opening around the empty cell `start` (flat index,
+        or an iterable of them to fill several openings in one pass).
+
+        Iterative scanline fill: every popped seed is stretched into the
+        widest run of empty cells on its row, that run and the cells
+        around it are uncovered, and the start of every unseen empty run
+        in the rows above/below is pushed as a new seed. Visited cells are
+        tracked in a bitmap so every cell is looked at a constant number
+        of times. Returns the flat indices that went from covered to
+        uncovered (flags are left alone, that's up to the caller).
+
+        Scanlines only make sense on square boards, other topologies walk
+        the neighbour table.
+        """
+        starts = [start] if isinstance(start, int) else list(start)
+        if self.topology != "square":
+            return self._tableflood(starts)
+
+        w, h = self._width, self._height
+        unc, cnt = self._uncovered, self._count
+        seen = bytearray(self.cellno)
+        revealed = []
+
+        stack = []
+        for i in starts:
+            if not seen[i]:
+                seen[i] = 1
+                stack.append(i)
+        while stack:
+            i = stack.pop()
+            y, x = divmod(i, w)
+            row = y * w
+
+            # stretch the seed into a run of empty cells
+            l = r = x
+            while l > 0 and cnt[row+l-1] == 0 and not seen[row+l-1]:
+                l -= 1
+            while r < w-1 and cnt[row+r+1] == 0 and not seen[row+r+1]:
+                r += 1
+            seen[row+l:row+r+1] = b"\x01" * (r-l+1)
+
+            # a cell next to an empty cell can't be a mine, so the run plus
+            # one cell either side is safe on this row and the next/previous
+            lo, hi = max(l-1, 0), min(r+1, w-1)
+            for ny in (y-1, y, y+1):
+                if ny < 0 or ny >= h:
+                    continue
+                nrow = ny * w
+                inrun = False
+                for j in range(nrow+lo, nrow+hi+1):
+                    if not unc[j]:
+                        unc[j] = 1
+                        revealed.append(j)
+                    if cnt[j] == 0 and not seen[j]:
+                        if not inrun:
+                            seen[j] = 1
+                            stack.append(j)
+                        inrun = True
+                    else:
+                        inrun = False
+
+        return revealed
+
+    def _tableflood(self, starts):
+        around = self.neighbourfn()
+        unc, cnt = self._uncovered, self._count
+        seen = bytearray(self.cellno)
+        revealed = []
+
+        stack = []
+        for i in starts:
+            if not seen[i]:
+                seen[i] = 1
+                stack.append(i)
+                if not unc[i]:
+                    unc[i] = 1
+                    revealed.append(i)
+        while stack:
+            i = stack.pop()
+            for j in around(i):
+                if seen[j]:
+                    continue
+                seen[j] = 1
+                if not unc[j]:
+                    unc[j] = 1
+                    revealed.append(j)
+                # only empty cells spread, no mine touches them
+                if cnt[j] == 0:
+                    stack.append(j)
+        return revealed
+
     def cols(self):
         """Return the number of columns in a grid."""
-        return len(self._grid[0])
-    
+        return self._width
+
     def rows(self):
         """Return the number of rows in the grid."""
-        return len(self._grid)
+        return self._height
+
+    # NEIGHBOURS
+
+    def table(self):
+        """The neighbour table of this grid's shape, see mod/topology.py."""
+        if self._table is None:
+            self._table = topologies.table(self.topology, self._width, self._height)
+        return self._table
+
+    def usetable(self):
+        return self.cellno <= TABLELIMIT
+
+    def neighbourfn(self):
+        """A function from a flat index to its neighbours that only keeps
+        the grid's shape, not the grid.
+        """
+        if self.usetable():
+            offsets, indices = self.table()
+            return lambda i: indices[offsets[i]:offsets[i+1]]
+        return partial(topologies.around, self.topology, self._width, self._height)
+
+    def neighbours(self, i):
+        """List the flat indices of the valid neighbours of flat index i."""
+        if self.usetable():
+            offsets, indices = self.table()
+            return indices[offsets[i]:offsets[i+1]]
+        if self.topology != "square":
+            return topologies.around(self.topology, self._width, self._height, i)
+
+        w = self._width
+        y, x = divmod(i, w)
+        xs = range(max(x-1, 0), min(x+2, w))
+        out = []
+        for ny in range(max(y-1, 0), min(y+2, self._height)):
+            row = ny * w
+            out.extend(row + nx for nx in xs if row + nx != i)
+        return out
 
     def iterneighbours(self, pos):
         """Iterate the valid neighbours of a coordinate."""
+        if self.usetable() or self.topology != "square":
+            w = self._width
+            for j in self.neighbours(self.index(pos)):
+                yield j % w, j // w
+            return
+
         x, y = pos
 
         if y > 0:
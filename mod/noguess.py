@@ -0,0 +1,145 @@
+"""No-guess board generation
+
+A candidate layout is played from the first click by the solver with
+guessing turned off. If the solver gets stuck, one of the mines it
+couldn't figure out is moved somewhere nobody has looked at yet and it
+tries again, a few times, before the candidate is given up on. Candidates
+come from consecutive seeds and are tried in parallel until one works or
+the time budget runs out.
+"""
+
+from __future__ import annotations
+
+import os
+import random
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import count
+from time import time
+from typing import NamedTuple, Optional
+
+from .engine import Board
+from .solver import Solver
+
+class Generated(NamedTuple):
+    layout: bytes  # the mine layer, a byte per cell
+    seed: int  # seed of the candidate that made it
+    solvable: bool  # False if the time ran out before a good one was found
+
+def candidate(
+    width, height, mines, first, seed, deadline=None, maxrepairs=40, topology="square"
+) -> Optional[bytearray]:
+    """Make the candidate for seed and repair it until it can be solved
+    without guessing. Returns its mine layer, or None if it couldn't be fixed.
+    """
+    rng = random.Random(seed)
+    board = Board(width, height, mines, topology=topology)
+    zone = board.safezone(first)
+    board.initialize(zone, rng)
+    safe = {board.grid.index(pos) for pos in zone}
+    layout = bytearray(board.grid.layer("mine"))
+
+    for _ in range(maxrepairs + 1):
+        trial = Board(width, height, mines, topology=topology)
+        trial.setmines(layout)
+        if Solver(trial, guess=False).play(first).won:
+            return layout
+        if deadline is not None and time() > deadline:
+            return None
+
+        # move one of the mines the solver got stuck on to a square
+        # that isn't next to anything uncovered yet
+        grid = trial.grid
+        unc, flag = grid.layer("uncovered"), grid.layer("flag")
+        stuck, free = [], []
+        for i in range(grid.cellno):
+            if unc[i] or flag[i]:
+                continue
+            border = any(unc[j] for j in grid.neighbours(i))
+            if border and layout[i]:
+                stuck.append(i)
+            elif not border and not layout[i] and i not in safe:
+                free.append(i)
+        if not stuck or not free:
+            return None
+
+        layout[rng.choice(stuck)] = 0
+        layout[rng.choice(free)] = 1
+
+    return None
+
+_pool: Optional[ProcessPoolExecutor] = None
+_poolsize = 0
+
+def _getpool(workers):
+    """The worker processes are kept around between boards."""
+    global _pool, _poolsize
+    if _pool is None or _poolsize != workers:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+        _pool = ProcessPoolExecutor(workers)
+        _poolsize = workers
+    return _pool
+
+def generate(
+    width, height, mines, first, seed=None, budget=1.0, workers=None, exact=False,
+    topology="square"
+) -> Generated:
+    """Generate a board that can be solved from first without guessing.
+
+    Candidates use seed, seed+1, ... and are spread over `workers`
+    processes (all cores by default, 1 means no pool). If nothing works
+    within `budget` seconds the plain board of the first seed is used.
+    With exact=True the candidate of seed itself is tried first in this
+    process, so a seed that worked before always gives the same board.
+    """
+    if seed is None:
+        seed = random.getrandbits(32)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    deadline = time() + budget
+    args = (width, height, mines, first)
+
+    if exact:
+        layout = candidate(*args, seed, topology=topology)
+        if layout is not None:
+            return Generated(bytes(layout), seed, True)
+        seed = (seed + 1) & 0xFFFFFFFF
+
+    # seeds are kept to 32 bits so they fit in a board code
+    seeds = ((seed + k) & 0xFFFFFFFF for k in count())
+
+    if workers <= 1:
+        for s in seeds:
+            layout = candidate(*args, s, deadline, topology=topology)
+            if layout is not None:
+                return Generated(bytes(layout), s, True)
+            if time() > deadline:
+                break
+    else:
+        pool = _getpool(workers)
+        pending = {}
+        for _ in range(workers):
+            s = next(seeds)
+            pending[pool.submit(candidate, *args, s, deadline, topology=topology)] = s
+        while pending:
+            done, _ = wait(pending, timeout=max(deadline - time(), 0), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for fut in done:
+                s = pending.pop(fut)
+                layout = fut.result()
+                if layout is not None:
+                    for other in pending:
+                        other.cancel()
+                    return Generated(bytes(layout), s, True)
+                if time() < deadline:
+                    nxt = next(seeds)
+                    pending[pool.submit(candidate, *args, nxt, deadline, topology=topology)] = nxt
+        for fut in pending:
+            fut.cancel()
+
+    # out of time, fall back to a normal board
+    rng = random.Random(seed)
+    board = Board(width, height, mines, topology=topology)
+    board.initialize(board.safezone(first), rng)
+    return Generated(bytes(board.grid.layer("mine")), seed, False)
@@ -0,0 +1,203 @@
+"""Openings of a board, found once when its mines are placed
+
+An opening is a connected area of empty squares (no mines around), and
+clicking any of its squares uncovers all of it plus the numbers around
+it. Since the mines never move after generation every opening can be
+labelled up front with union-find, which makes clicking an empty square
+one bulk reveal of a known area instead of a flood fill, and gives the
+board's 3BV and number of openings for free.
+
+Openings are kept as runs of empty squares, (start, end) like a slice,
+in padded indices: every row gets one blocked square on its end (rows
+are width + 1 long) so runs never carry on into the next row and all of
+them can be found in one go from the bytes of the board. On square
+boards the runs of neighbouring rows are joined when they touch
+(diagonals too) in a single sweep over all of them, and revealing a run
+is three slice assignments, the row itself and the ones above and
+below, widened by one square for the border. Other topologies join and
+reveal squares one at a time through the neighbour table.
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import accumulate, compress, count, repeat
+from operator import add
+from typing import List
+
+_zero = bytes([1]) + bytes(255)
+_flip = bytes([1, 0]) + bytes(254)  # covered (0) -> 1, uncovered -> 0
+
+def _positions(mask: bytes) -> array:
+    """Where the 1 bytes of a 0/1 mask are. The lengths of the pieces
+    between them add up to the positions, without looping over every
+    byte in Python.
+    """
+    pieces = mask.split(b"\x01")
+    pieces.pop()
+    return array("i", map(add, accumulate(map(len, pieces)), count()))
+
+class Openings:
+    def __init__(self, grid):
+        # the board can swap its grid's layers (saves) so only the shape
+        # is kept
+        w, h = grid.cols(), grid.rows()
+        self.width, self.height = w, h
+        self.stride = w + 1  # padded row length
+        self.neighbours = grid.neighbourfn() if grid.topology != "square" else None
+        n = w * h
+        mine = bytes(grid.layer("mine"))
+        counts = bytes(grid.layer("count"))
+
+        # 1 for empty squares, 0 for numbers and mines
+        mines = int.from_bytes(mine, "little")
+        cells = int.from_bytes(counts.translate(_zero), "little") & ~mines
+        empty = cells.to_bytes(n, "little")
+        padded = b"".join(empty[y*w:(y+1)*w] + b"\x00" for y in range(h))
+        size = len(padded)
+
+        if self.neighbours is None:
+            # runs start on an empty square after a blocked one and end on
+            # a blocked square after an empty one
+            e = int.from_bytes(padded, "little")
+            starts = _positions((e & ~(e << 8)).to_bytes(size, "little"))
+            ends = _positions((e << 8 & ~e).to_bytes(size, "little"))
+        else:
+            # side by side squares aren't always neighbours (knight's moves)
+            # so other topologies get a run per square
+            starts = _positions(padded)
+            ends = array("i", (s + 1 for s in starts))
+        self._starts, self._ends = starts, ends
+
+        parent = list(range(len(starts)))
+        if self.neighbours is None:
+            self._joinrows(parent)
+        else:
+            self._jointable(parent)
+
+        # the roots are always the first run of their opening, so going
+        # through the runs in order every parent is already numbered
+        # and the openings get numbered in the order they show up
+        self.runs: List[List[int]] = []  # the run numbers of every opening
+        for r, p in enumerate(parent):
+            if p == r:
+                parent[r] = len(self.runs)
+                self.runs.append([r])
+            else:
+                parent[r] = k = parent[p]
+                self.runs[k].append(r)
+        self.count = len(self.runs)  # number of openings
+        self._opening = parent  # the opening of every run
+
+        # 3BV: a click per opening and per number that isn't next to one
+        if self.neighbours is None:
+            done = self._around(cells, w, h)
+        else:
+            spans = bytearray(n)
+            for k in range(self.count):
+                for a, b in self._spans(k):
+                    spans[a:b] = b"\x01" * (b - a)
+            done = int.from_bytes(spans, "little")
+        covered = mines | done
+        self.threebv = self.count + covered.to_bytes(n, "little").count(0)
+
+    @staticmethod
+    def _around(cells, w, h) -> int:
+        """The empty squares (cells, a byte each) and every square next to
+        one, with the same byte per cell shifting as Grid.recount.
+        """
+        n = w * h
+        if n == 0:
+            return 0
+        notfirst = int.from_bytes((b"\x00" + b"\x01" * (w - 1)) * h, "little")
+        notlast = int.from_bytes((b"\x01" * (w - 1) + b"\x00") * h, "little")
+        horiz = cells | (cells & notlast) << 8 | (cells & notfirst) >> 8
+        row = 8 * w
+        return (horiz | horiz << row | horiz >> row) & ((1 << (8 * n)) - 1)
+
+    def _joinrows(self, parent):
+        """Join every run to the runs a row above it that it touches. The
+        runs above are moved down a row (the padding keeps them from
+        touching anything else) and swept along with the runs below.
+        A root is always the lowest run of its opening.
+        """
+        starts, ends, stride = self._starts, self._ends, self.stride
+        below = array("i", map(add, starts, repeat(stride)))
+        i = 0
+        for j in range(bisect_left(starts, stride), len(starts)):
+            # touching counts diagonally, so one square apart is enough
+            start, end = starts[j], ends[j]
+            while ends[i] + stride < start:
+                i += 1
+            k, root = i, j
+            while below[k] <= end:
+                ra = k
+                while parent[ra] != ra:
+                    parent[ra] = ra = parent[parent[ra]]
+                if ra < root:
+                    parent[root] = ra
+                    root = ra
+                elif root < ra:
+                    parent[ra] = root
+                k += 1
+
+    def _jointable(self, parent):
+        around = self.neighbours
+        stride = self.stride
+        owner = {s - s // stride: r for r, s in enumerate(self._starts)}  # empty square -> its run
+        for i, r in owner.items():
+            for j in around(i):
+                rb = owner.get(j)
+                if rb is not None:
+                    ra = r
+                    while parent[ra] != ra:
+                        parent[ra] = ra = parent[parent[ra]]
+                    while parent[rb] != rb:
+                        parent[rb] = rb = parent[parent[rb]]
+                    if ra < rb:
+                        parent[rb] = ra
+                    elif rb < ra:
+                        parent[ra] = rb
+
+    def _spans(self, k):
+        """The slices of flat indices opening k uncovers, border included
+        (they can overlap).
+        """
+        w, h, stride = self.width, self.height, self.stride
+        starts, ends = self._starts, self._ends
+        if self.neighbours is not None:
+            for r in self.runs[k]:
+                i = starts[r] - starts[r] // stride
+                yield i, i + 1
+                for j in self.neighbours(i):
+                    yield j, j + 1
+            return
+        for r in self.runs[k]:
+            y, x0 = divmod(starts[r], stride)
+            lo, hi = max(x0 - 1, 0), min(ends[r] - y * stride + 1, w)
+            for ny in (y-1, y, y+1):
+                if 0 <= ny < h:
+                    yield ny * w + lo, ny * w + hi
+
+    def of(self, i) -> int:
+        """The opening of flat index i, -1 if it's not an empty square."""
+        i += i // self.width
+        r = bisect_right(self._starts, i) - 1
+        if r < 0 or i >= self._ends[r]:
+            return -1
+        return self._opening[r]
+
+    def reveal(self, grid, openings) -> List[int]:
+        """Uncover whole openings (ids, see of()) on grid in one go.
+
+        Returns the flat indices that went from covered to uncovered, like
+        Grid.flood (flags are left alone).
+        """
+        unc = grid.layer("uncovered")
+        revealed = []
+        for k in set(openings):
+            for a, b in self._spans(k):
+                seg = bytes(unc[a:b])
+                if 0 in seg:
+                    revealed.extend(compress(range(a, b), seg.translate(_flip)))
+                    unc[a:b] = b"\x01" * (b - a)
+        return revealed
@@ -0,0 +1,159 @@
+"""Whole-board pictures, for zoomed out views and the minimap
+
+When the squares are only a few pixels big drawing them one tile at a
+time is far too slow for a board with millions of cells. Instead every
+cell is one byte of an 8-bit palettized surface (one pixel per cell, the
+byte is how the cell looks and the palette turns that into a colour),
+made straight from the board's layers with the same byte-per-cell big
+integer tricks as Grid.recount. The surface is made with
+pygame.image.frombuffer so it shares its memory with the bytes, a move
+only has to change the bytes of the cells it touched. The part in view
+is then scaled up in one go.
+"""
+
+from typing import Optional
+
+import pygame
+
+from .engine import State
+
+# what a cell looks like, one palette entry each
+COVERED = 0
+FLAG = 1
+MINE = 2
+WRONG = 3  # a flag without a mine under it
+TARGET = 4  # the mine that lost the game
+NUMBER = 5  # 5 + the number, 0 being blank
+
+def _mix(color, other, amount):
+    return tuple(round(a + (b - a) * amount) for a, b in zip(color, other))
+
+def palette(numcolors) -> list:
+    """The colours of the looks, numbers are their colour faded out a bit
+    so the board doesn't turn into noise.
+    """
+    white = (255, 255, 255)
+    colors = [
+        (190, 190, 190),  # pygame's "grey", like the covered tile
+        (230, 120, 0),
+        (0, 0, 0),
+        (120, 0, 120),
+        (255, 0, 0),
+        white,
+    ]
+    for number in range(1, 9):
+        colors.append(_mix(pygame.Color(numcolors[number])[:3], white, 0.4))
+    return colors + [white] * (256 - len(colors))
+
+class Overview:
+    def __init__(self, board, numcolors):
+        self.board = board
+        self.palette = palette(numcolors)
+        self.looks = bytearray()
+        self.surface: Optional[pygame.Surface] = None
+        self._made = None  # (state, target) the looks were made for
+        self._thumb = None  # (size, surface) of the minimap
+
+    @property
+    def grid(self):
+        return self.board.grid
+
+    def look(self, i) -> int:
+        """How flat index i looks (the slow way, for a few cells)."""
+        grid, state = self.grid, self.board.state
+        mined, uncovered = grid._mine[i], grid._uncovered[i]
+        count, flagged = grid._count[i], grid._flag[i]
+        if self.board.target is not None and grid.index(self.board.target) == i:
+            return TARGET
+        if uncovered:
+            return NUMBER + count
+        if state is State.lost:
+            if mined and not flagged:
+                return MINE
+            if flagged and not mined:
+                return WRONG
+        elif state is State.won and not flagged:
+            return NUMBER + count
+        return FLAG if flagged else COVERED
+
+    def remake(self):
+        """Work out the look of every cell in one go."""
+        grid, state = self.grid, self.board.state
+        n = grid.cellno
+
+        def big(name):
+            return int.from_bytes(grid.layer(name), "little")
+
+        mine, unc, flag = big("mine"), big("uncovered"), big("flag")
+        ones = int.from_bytes(b"\x01" * n, "little")
+        numbers = big("count") + NUMBER * ones
+        # the 0/1 layers times 0xFF are masks of whole bytes
+        looks = (numbers & unc * 0xFF) | flag * FLAG
+        covered = ones ^ unc
+        if state is State.lost:
+            looks |= (mine & covered & ~flag) * MINE
+            # FLAG | 2 is WRONG
+            looks |= (flag & ~mine) * (WRONG ^ FLAG)
+        elif state is State.won:
+            looks |= numbers & (covered & ~flag) * 0xFF
+
+        self.looks = bytearray(looks.to_bytes(n, "little"))
+        if self.board.target is not None:
+            self.looks[grid.index(self.board.target)] = TARGET
+        self.surface = pygame.image.frombuffer(self.looks, (grid.cols(), grid.rows()), "P")
+        self.surface.set_palette(self.palette)
+        self._made = (state, self.board.target)
+        self._thumb = None
+
+    def update(self, changed):
+        """Catch up with the cells that changed (flat indices)."""
+        if self.surface is None:
+            return  # nothing's been drawn yet
+        if self._made != (self.board.state, self.board.target):
+            # losing or winning changes the look of the whole board
+            self.remake()
+            return
+        looks = self.looks
+        for i in changed:
+            looks[i] = self.look(i)
+        if changed:
+            self._thumb = None
+
+    def draw(self, image: pygame.Surface, camera):
+        """Draw the cells in view on image (the board's view surface)."""
+        if self.surface is None:
+            self.remake()
+        left, top, right, bottom = camera.visible()
+        if right < left or bottom < top:
+            return
+        part = self.surface.subsurface((left, top, right - left + 1, bottom - top + 1))
+        sq = camera.sqrsize
+        size = ((right - left + 1) * sq, (bottom - top + 1) * sq)
+        image.blit(pygame.transform.scale(part, size), camera.grid2view((left, top)))
+
+    def minimap(self, camera, maxsize) -> pygame.Surface:
+        """The whole board shrunk to fit in maxsize pixels, with the part
+        in view outlined.
+        """
+        if self.surface is None:
+            self.remake()
+        w, h = self.grid.cols(), self.grid.rows()
+        scale = min(maxsize / w, maxsize / h)
+        size = (max(round(w * scale), 1), max(round(h * scale), 1))
+        if self._thumb is None or self._thumb[0] != size:
+            # kept until the board changes, shrinking a huge board isn't free
+            thumb = pygame.transform.scale(self.surface, size)
+            if pygame.display.get_surface() is not None:
+                # quicker to blit, but only once there's a window to match
+                thumb = thumb.convert()
+            self._thumb = (size, thumb)
+        out = self._thumb[1].copy()
+
+        left, top, right, bottom = camera.visible()
+        rect = pygame.Rect(
+            left * scale, top * scale,
+            max((right - left + 1) * scale, 2), max((bottom - top + 1) * scale, 2)
+        )
+        pygame.draw.rect(out, (255, 0, 255), rect, width=1)
+        pygame.draw.rect(out, (0, 0, 0), out.get_rect(), width=1)
+        return out
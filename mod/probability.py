@@ -0,0 +1,134 @@
+"""Mine chances of every covered square, kept up to date as the board changes
+
+Unlike the solver this only trusts what the board shows: flags are the
+player's guesses so they count as covered squares, and the mines left are
+all of the board's mines.
+
+The numbers next to covered squares split into independent components
+(see Solver.components) and enumerating a component is the expensive
+part. A click only changes the constraints of the numbers around what it
+uncovered, so only the components those numbers were in (or now reach
+into) are split up and enumerated again, every other one is kept as it
+is. Putting the components together (solver.combine) is cheap and is
+redone every time since the mine count ties them all together.
+
+The chances are exact except in components with more than maxcomponent
+squares, those are too slow to enumerate and their squares get the same
+chance as the squares away from the numbers. Heatmap.approximate says
+which squares those are.
+"""
+
+from typing import Dict, NamedTuple, Optional, Set, Tuple
+
+from .engine import Board
+from .solver import Solver, combine
+
+class Component(NamedTuple):
+    cells: Set[int]
+    numbers: Set[int]  # the uncovered numbers around it
+    key: frozenset  # its constraints
+    res: Optional[tuple]  # (dist, percell), None if it was too big
+
+class Heatmap:
+    def __init__(self, board: Board, maxcomponent: int = 40):
+        self.board = board
+        # components with more squares than this are too slow to enumerate
+        # and are treated like the squares away from the numbers
+        self.maxcomponent = maxcomponent
+
+        # number -> (covered squares around it, mines among them)
+        self.cons: Dict[int, Tuple[frozenset, int]] = {}
+        self._comps: Dict[int, Component] = {}
+        self._owner: Dict[int, int] = {}  # square -> its component's id
+        self._nextid = 0
+        self.probs: Dict[int, float] = {}
+        self.rest: Optional[float] = None  # chance of every other covered square
+
+        grid = board.grid
+        unc = grid.layer("uncovered")
+        self.update([i for i in range(grid.cellno) if unc[i]])
+
+    @property
+    def grid(self):
+        return self.board.grid
+
+    def probability(self, i) -> Optional[float]:
+        """Chance of a mine on flat index i, None if it's uncovered."""
+        if self.grid.layer("uncovered")[i]:
+            return None
+        return self.probs.get(i, self.rest)
+
+    def approximate(self, i) -> bool:
+        """If flat index i is in a component too big to enumerate, so its
+        chance is only a guess.
+        """
+        k = self._owner.get(i)
+        return k is not None and self._comps[k].res is None
+
+    def update(self, changed):
+        """Catch up with the cells that were just uncovered (flat indices)."""
+        grid = self.grid
+        unc, cnt = grid.layer("uncovered"), grid.layer("count")
+
+        touched = set(changed)
+        for i in changed:
+            touched.update(grid.neighbours(i))
+        # the components a changed number was in or now reaches into
+        dirty = set()
+        for i in touched:
+            old = self.cons.get(i)
+            if old is not None:
+                dirty.add(self._owner[next(iter(old[0]))])
+            cells = None
+            if unc[i] and cnt[i]:
+                cells = frozenset(j for j in grid.neighbours(i) if not unc[j])
+            if cells:
+                self.cons[i] = (cells, cnt[i])
+                dirty.update(self._owner[j] for j in cells if j in self._owner)
+            else:
+                self.cons.pop(i, None)
+
+        self._resplit(dirty, touched)
+        self._recompute()
+
+    def _resplit(self, dirty, touched):
+        """Split the dirty components and the changed numbers into
+        components again, enumerating the ones that are new.
+        """
+        old = [self._comps.pop(k) for k in dirty]
+        numbers = {i for i in touched if i in self.cons}
+        for comp in old:
+            numbers.update(i for i in comp.numbers if i in self.cons)
+            for c in comp.cells:
+                del self._owner[c]
+        # a part that didn't change keeps its enumeration
+        known = {comp.key: comp.res for comp in old}
+
+        sub = {i: self.cons[i] for i in numbers}
+        for cells, group in Solver.components(sub):
+            key = frozenset(group)
+            res = None
+            if len(cells) <= self.maxcomponent:
+                res = known.get(key)
+                if res is None:
+                    res = Solver.enumerate(cells, group)
+            k = self._nextid
+            self._nextid += 1
+            self._comps[k] = Component(cells, set(), key, res)
+            for c in cells:
+                self._owner[c] = k
+        for i in numbers:
+            self._comps[self._owner[next(iter(sub[i][0]))]].numbers.add(i)
+
+    def _recompute(self):
+        comps = []
+        framed = 0
+        for comp in self._comps.values():
+            if comp.res is not None:
+                comps.append(comp.res)
+                framed += len(comp.cells)
+
+        covered = self.grid.cellno - self.grid.total("uncovered")
+        probs, rest = combine(comps, covered - framed, self.board.minesno)
+        self.probs = {c: num / den for c, (num, den) in probs.items()}
+        self.rest = rest[0] / rest[1] if rest is not None else None
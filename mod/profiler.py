@@ -0,0 +1,138 @@
+"""Frame profiler, times every stage of a frame
+
+Stages are timed with `with profiler.section("name"):` and things like
+cells drawn are counted with profiler.count(). The last few hundred
+frames are kept so the overlay (F3 in the game) can show percentiles and
+they can be exported as a Chrome trace (F4) to look at in
+chrome://tracing or https://ui.perfetto.dev.
+
+There's one profiler for the whole game (`profiler` at the bottom) so
+anything can count things without needing the game object.
+"""
+
+import json
+from collections import deque
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Dict, List, Tuple
+
+class Frame:
+    def __init__(self, start: float):
+        self.start = start
+        self.end = start
+        # (name, start, duration) in the order they finished
+        self.sections: List[Tuple[str, float, float]] = []
+        self.counts: Dict[str, int] = {}
+
+    def time(self, name) -> float:
+        return sum(dur for n, _, dur in self.sections if n == name)
+
+class Profiler:
+    # sections that are waiting instead of working
+    idle = ("tick", "wait")
+
+    def __init__(self, frames: int = 300):
+        self.frames: "deque[Frame]" = deque(maxlen=frames)
+        self.current = Frame(perf_counter())
+        self.shown = False  # is the overlay on?
+
+    @contextmanager
+    def section(self, name: str):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.current.sections.append((name, start, perf_counter() - start))
+
+    def count(self, name: str, n: int = 1):
+        counts = self.current.counts
+        counts[name] = counts.get(name, 0) + n
+
+    def endframe(self):
+        now = perf_counter()
+        self.current.end = now
+        self.frames.append(self.current)
+        self.current = Frame(now)
+
+    # STATS
+
+    @staticmethod
+    def percentiles(values, ps=(50, 95, 99)):
+        if not values:
+            return [0.0 for _ in ps]
+        values = sorted(values)
+        last = len(values) - 1
+        return [values[min(round(p / 100 * last), last)] for p in ps]
+
+    def names(self) -> List[str]:
+        """Every section name seen, in the order they first ran."""
+        seen = {}
+        for frame in self.frames:
+            for name, _, _ in frame.sections:
+                seen.setdefault(name, None)
+        return list(seen)
+
+    def stats(self):
+        """{name: (p50, p95, p99)} in milliseconds for every section, plus
+        "frame" (the whole frame) and "busy" (the frame minus waiting), and
+        {name: (p50, p95, p99)} for the counters.
+        """
+        times = {}
+        for name in self.names():
+            times[name] = self.percentiles([f.time(name) * 1000 for f in self.frames])
+        frames = [(f.end - f.start) * 1000 for f in self.frames]
+        idle = [sum(f.time(n) for n in self.idle) * 1000 for f in self.frames]
+        times["busy"] = self.percentiles([t - i for t, i in zip(frames, idle)])
+        times["frame"] = self.percentiles(frames)
+
+        countnames = {name for f in self.frames for name in f.counts}
+        counts = {
+            name: self.percentiles([f.counts.get(name, 0) for f in self.frames])
+            for name in sorted(countnames)
+        }
+        return times, counts
+
+    def lines(self) -> List[str]:
+        """The overlay's text."""
+        times, counts = self.stats()
+        out = [f"{'ms':12}{'p50':>7}{'p95':>7}{'p99':>7}"]
+        for name, (p50, p95, p99) in times.items():
+            out.append(f"{name:12}{p50:7.2f}{p95:7.2f}{p99:7.2f}")
+        for name, (p50, p95, p99) in counts.items():
+            out.append(f"{name:12}{p50:7.0f}{p95:7.0f}{p99:7.0f}")
+        return out
+
+    # EXPORT
+
+    def trace(self) -> dict:
+        """The kept frames in the Chrome trace event format."""
+        events = []
+        if not self.frames:
+            return {"traceEvents": events}
+        base = self.frames[0].start
+
+        def us(t):
+            return (t - base) * 1e6
+
+        for frame in self.frames:
+            events.append({
+                "name": "frame", "ph": "X", "pid": 1, "tid": 1,
+                "ts": us(frame.start), "dur": (frame.end - frame.start) * 1e6
+            })
+            for name, start, dur in frame.sections:
+                events.append({
+                    "name": name, "ph": "X", "pid": 1, "tid": 1,
+                    "ts": us(start), "dur": dur * 1e6
+                })
+            if frame.counts:
+                events.append({
+                    "name": "counts", "ph": "C", "pid": 1,
+                    "ts": us(frame.start), "args": dict(frame.counts)
+                })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export(self, path: str):
+        with open(path, "w") as f:
+            json.dump(self.trace(), f)
+
+profiler = Profiler()
@@ -0,0 +1,200 @@
+"""Replays, a log of every move of a game
+
+A replay file is a header followed by one record per move and is only
+ever appended to, so a game that crashes halfway still leaves a replay
+of everything up to that point.
+
+The header is the magic bytes, a version byte and the raw bytes of the
+board's code (see boardcode.py), so the board itself never has to be
+stored. Every move after it is two varints:
+
+    (milliseconds since the last move << 2) | kind,  flat index of the cell
+
+which is 2-4 bytes for a move at human speed on a normal sized board.
+Only normal boards can be recorded, endless ones don't have codes.
+"""
+
+import base64
+import os
+import time
+from typing import BinaryIO, Iterator, NamedTuple, Optional, Tuple
+
+from . import boardcode
+from .engine import Board
+
+MAGIC = b"MSRP"
+VERSION = 1
+_codesize = 18  # raw bytes of a board code
+
+# move kinds
+OPEN = 0
+FLAG = 1
+CHORD = 2
+UNDO = 3  # the cell of an undo doesn't matter, redos are logged as moves
+
+class Move(NamedTuple):
+    dt: int  # milliseconds since the move before
+    kind: int
+    cell: Tuple[int, int]
+
+class Outcome(NamedTuple):
+    board: Board
+    moves: int
+    time: int  # milliseconds from the first move to the last
+
+def _varint(n: int) -> bytes:
+    out = bytearray()
+    while n > 0x7F:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+    return bytes(out)
+
+class Recorder:
+    """Appends the moves of a board to a replay file.
+
+    Nothing is written until the first move, the header needs the board's
+    code and a board has none before its first click.
+    """
+
+    def __init__(self, path: str, board: Board):
+        self.path = path
+        self.board = board
+        self._file: Optional[BinaryIO] = None
+        self._last = 0.0
+
+    def record(self, kind: int, cell):
+        if not self.board.initialized:
+            return
+        now = time.monotonic()
+        if self._file is None:
+            raw = base64.urlsafe_b64decode(self.board.code)
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._file = self._create()
+            self._file.write(MAGIC + bytes([VERSION]) + raw)
+            self._last = now
+
+        dt = max(round((now - self._last) * 1000), 0)
+        self._last = now
+        index = self.board.grid.index(cell)
+        self._file.write(_varint(dt << 2 | kind) + _varint(index))
+        # flushed every move so a crash doesn't lose the end of the game
+        self._file.flush()
+
+    def _create(self) -> BinaryIO:
+        """Make a new file for the replay, never adding to another one
+        (two games started in the same second get the same name).
+        """
+        root, ext = os.path.splitext(self.path)
+        n = 1
+        while True:
+            try:
+                return open(self.path, "xb")
+            except FileExistsError:
+                n += 1
+                self.path = f"{root}-{n}{ext}"
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+def _readheader(f: BinaryIO) -> boardcode.BoardInfo:
+    head = f.read(len(MAGIC) + 1 + _codesize)
+    if len(head) < len(MAGIC) + 1 + _codesize or head[:len(MAGIC)] != MAGIC:
+        raise ValueError("Not a replay file")
+    if head[len(MAGIC)] != VERSION:
+        raise ValueError(f"Unknown replay version {head[len(MAGIC)]}")
+    code = base64.urlsafe_b64encode(head[len(MAGIC) + 1:]).decode("ascii")
+    return boardcode.decode(code)
+
+def _varints(f: BinaryIO, blocksize: int) -> Iterator[int]:
+    """Stream the varints of a file a block at a time."""
+    n = shift = 0
+    while True:
+        block = f.read(blocksize)
+        if not block:
+            break
+        for b in block:
+            n |= (b & 0x7F) << shift
+            if b & 0x80:
+                shift += 7
+            else:
+                yield n
+                n = shift = 0
+    if shift:
+        raise ValueError("Replay ends in the middle of a move")
+
+class Replay:
+    """Reads a replay file, the moves are streamed and never all loaded."""
+
+    def __init__(self, path: str, blocksize: int = 1 << 16):
+        self.path = path
+        self.blocksize = blocksize
+        with open(path, "rb") as f:
+            self.info = _readheader(f)
+
+    def board(self) -> Board:
+        """A fresh board the replay can be played on."""
+        info = self.info
+        board = Board(
+            info.width, info.height, info.mines, info.noguess, info.seed,
+            info.topology
+        )
+        board.generate(info.first)
+        return board
+
+    def __iter__(self) -> Iterator[Move]:
+        width, height = self.info.width, self.info.height
+        with open(self.path, "rb") as f:
+            _readheader(f)
+            ints = _varints(f, self.blocksize)
+            for head in ints:
+                index = next(ints, None)
+                if index is None:
+                    raise ValueError("Replay ends in the middle of a move")
+                if index >= width * height:
+                    raise ValueError(f"Move on a cell outside the board ({index})")
+                yield Move(head >> 2, head & 3, divmod(index, width)[::-1])
+
+def apply(board: Board, move: Move):
+    """Do a move on a board, returns the changed cells like Board.click."""
+    if move.kind == OPEN:
+        return board.click(move.cell)
+    if move.kind == FLAG:
+        return board.click(move.cell, flagging=True)
+    if move.kind == CHORD:
+        return board.chord(move.cell)
+    if move.kind == UNDO:
+        return board.undo()
+    raise ValueError(f"Unknown move kind {move.kind}")
+
+def play(replay: Replay, board: Optional[Board] = None, speed: Optional[float] = None):
+    """Play a replay on a board, yielding every move and what it changed.
+
+    With a speed the moves are spaced out like they were played (2 is
+    twice as fast), without one it goes as fast as the engine can.
+    """
+    if board is None:
+        board = replay.board()
+    for move in replay:
+        if speed:
+            time.sleep(move.dt / 1000 / speed)
+        yield move, apply(board, move)
+
+def verify(path: str) -> Outcome:
+    """Play a replay headlessly, as fast as possible.
+
+    Raises ValueError if the file is broken or has moves after the game
+    ended (other than undos).
+    """
+    replay = Replay(path)
+    board = replay.board()
+    moves = total = 0
+    for move in replay:
+        if board.over and move.kind != UNDO:
+            raise ValueError(f"Move after the game ended ({moves} moves in)")
+        apply(board, move)
+        moves += 1
+        total += move.dt
+    return Outcome(board, moves, total)
@@ -0,0 +1,152 @@
+"""Saved games, kept in a file that's memory-mapped while playing
+
+The file is a fixed 64 byte header with the board's counters followed by
+its four layers back to back, byte for byte the way they are in memory:
+
+    header | mine (n) | uncovered (n) | count (n) | flag (n)
+
+Loading a save doesn't read the layers, the grid just gets views into the
+mapped file (see Grid.frombuffers), so even a huge board comes back right
+away. From then on every move writes straight into the mapped pages and
+an autosave is only the header plus flushing the pages that changed.
+"""
+
+import mmap
+import os
+import struct
+
+from .engine import Board, State
+from .grid import Grid
+from .topology import NAMES
+
+MAGIC = b"MSSV"
+VERSION = 1
+# magic, version, state, flags | width, height, mines, flagged,
+# correct squares, seed | first x, y, target x, y (-1 for None)
+_header = struct.Struct("<4sBBBxIIIiIIiiii")
+HEADERSIZE = 64
+
+# flags
+INITIALIZED = 1
+NOGUESS = 2
+EXACTSEED = 4
+TOPOLOGYSHIFT = 3  # the rest of the flags are the index in topology.NAMES
+
+_layers = ("mine", "uncovered", "count", "flag")
+
+def _cell(pos):
+    return pos if pos is not None else (-1, -1)
+
+def _uncell(x, y):
+    return (x, y) if x >= 0 else None
+
+class SaveFile:
+    """A board backed by a memory-mapped save file.
+
+    Use SaveFile.create() to start saving a board and SaveFile.open() to
+    resume one, then sync() after moves and close() when done.
+    """
+
+    def __init__(self, path: str, file, mapped: mmap.mmap, board: Board):
+        self.path = path
+        self.board = board
+        self._file = file
+        self._mmap = mapped
+        self._view = memoryview(mapped)
+
+    @classmethod
+    def create(cls, path: str, board: Board) -> "SaveFile":
+        """Write a board to a new save file and move its layers into it."""
+        grid = board.grid
+        with open(path, "wb") as f:
+            f.write(bytes(HEADERSIZE))
+            for name in _layers:
+                f.write(grid.layer(name))
+
+        save = cls._map(path, board, grid.cols(), grid.rows())
+        save.sync()
+        return save
+
+    @classmethod
+    def open(cls, path: str) -> "SaveFile":
+        """Resume the board of a save file.
+
+        Raises ValueError if it isn't a save file (or a broken one).
+        """
+        with open(path, "rb") as f:
+            head = f.read(HEADERSIZE)
+        if len(head) < HEADERSIZE or head[:4] != MAGIC:
+            raise ValueError("Not a save file")
+        (
+            _, version, state, flags, width, height, mines, flagged,
+            correct, seed, fx, fy, tx, ty
+        ) = _header.unpack_from(head)
+        if version != VERSION:
+            raise ValueError(f"Unknown save version {version}")
+        if os.path.getsize(path) != HEADERSIZE + 4 * width * height:
+            raise ValueError("Save file is the wrong size for its board")
+        shape = flags >> TOPOLOGYSHIFT
+        if shape >= len(NAMES):
+            raise ValueError("Save file has an unknown board shape")
+
+        # the grid is swapped for the mapped one in _map
+        board = Board(0, 0, mines, bool(flags & NOGUESS), seed, NAMES[shape])
+        board.exactseed = bool(flags & EXACTSEED)
+        board.initialized = bool(flags & INITIALIZED)
+        board.flagged = flagged
+        board.correctsquares = correct
+        board.first = _uncell(fx, fy)
+        board.target = _uncell(tx, ty)
+        board.state = State(state)
+        return cls._map(path, board, width, height)
+
+    @classmethod
+    def _map(cls, path, board, width, height):
+        f = open(path, "r+b")
+        mapped = mmap.mmap(f.fileno(), 0)
+        save = cls(path, f, mapped, board)
+        n = width * height
+        views = [
+            save._view[HEADERSIZE + k * n:HEADERSIZE + (k + 1) * n]
+            for k in range(len(_layers))
+        ]
+        board.grid = Grid.frombuffers(width, height, *views, topology=board.grid.topology)
+        return save
+
+    def sync(self):
+        """Autosave: write the counters and flush the pages that changed."""
+        board = self.board
+        flags = (
+            (INITIALIZED if board.initialized else 0)
+            | (NOGUESS if board.noguess else 0)
+            | (EXACTSEED if board.exactseed else 0)
+            | NAMES.index(board.grid.topology) << TOPOLOGYSHIFT
+        )
+        _header.pack_into(
+            self._mmap, 0,
+            MAGIC, VERSION, board.state.value, flags,
+            board.grid.cols(), board.grid.rows(), board.minesno, board.flagged,
+            board.correctsquares, board.seed & 0xFFFFFFFF,
+            *_cell(board.first), *_cell(board.target)
+        )
+        self._mmap.flush()
+
+    def close(self, remove=False):
+        """Stop saving, the board gets its layers back in normal memory.
+
+        With remove=True the file is deleted too (e.g. the game is over).
+        """
+        if self._mmap is None:
+            return
+        grid = self.board.grid
+        views = [grid.layer(name) for name in _layers]
+        grid.setlayers(*(bytearray(v) for v in views))
+        # every view has to be let go of before the map can be closed
+        for v in views:
+            v.release()
+        self._view.release()
+        self._mmap.close()
+        self._file.close()
+        self._mmap = None
+        if remove:
+            os.remove(self.path)
@@ -0,0 +1,404 @@
+"""A minesweeper solver that plays a Board through its own click/flag API
+
+It works in rounds, always trying the cheapest rule first:
+  1. single cell rules: a number with all its mines flagged is safe
+     around, a number with as many covered squares as missing mines
+     has a mine in all of them
+  2. subset rules: if one number's covered squares are a subset of
+     another's, the difference holds the difference of their mines
+  3. full enumeration: the frontier is split into independent
+     components and every consistent layout of each one is counted,
+     weighted by how the remaining mines can fit in the rest of the board
+  4. a guess on the square least likely to be a mine (if allowed)
+"""
+
+from __future__ import annotations
+
+from math import comb
+from time import perf_counter
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from .engine import Board, State
+
+class SolveResult(NamedTuple):
+    won: bool
+    moves: int  # clicks and flags sent to the board
+    guesses: int  # moves that weren't certain
+    time: float  # seconds spent solving
+
+    @property
+    def timepermove(self) -> float:
+        return self.time / self.moves if self.moves else 0.0
+
+class Solver:
+    def __init__(self, board: Board, guess: bool = True, maxcomponent: int = 40):
+        self.board = board
+        self.grid = board.grid
+        self.guess = guess
+        # components with more squares than this are too expensive to
+        # enumerate and are treated like the rest of the unknown squares
+        self.maxcomponent = maxcomponent
+
+        self.moves = 0
+        self.guesses = 0
+
+        # numbers that still have covered squares around them
+        self.frontier = set()
+        # numbers whose surroundings changed since the last round
+        self.todo = set()
+
+    # HELPERS
+
+    def unknown(self, i) -> bool:
+        """Neither uncovered nor flagged (the solver only flags sure mines)."""
+        return not self.grid._uncovered[i] and not self.grid._flag[i]
+
+    def constraint(self, i) -> Tuple[List[int], int]:
+        """The covered squares around number i and how many mines they hold."""
+        cells = []
+        need = self.grid._count[i]
+        for j in self.grid.neighbours(i):
+            if self.grid._flag[j]:
+                need -= 1
+            elif not self.grid._uncovered[j]:
+                cells.append(j)
+        return cells, need
+
+    def _touch(self, changed):
+        """Queue the numbers around cells that just changed."""
+        unc = self.grid._uncovered
+        for i in changed:
+            if unc[i]:
+                self.todo.add(i)
+            for j in self.grid.neighbours(i):
+                if unc[j]:
+                    self.todo.add(j)
+
+    def open(self, i):
+        if not self.unknown(i) or self.board.over:
+            return
+        self.moves += 1
+        self._touch(self.board.click(self.grid.pos(i)))
+
+    def flag(self, i):
+        if not self.unknown(i) or self.board.over:
+            return
+        self.moves += 1
+        self._touch(self.board.click(self.grid.pos(i), True))
+
+    def chord(self, i):
+        if self.board.over:
+            return
+        changed = self.board.chord(self.grid.pos(i))
+        if changed:
+            self.moves += 1
+            self._touch(changed)
+
+    def apply(self, safe, mines, chords=()) -> bool:
+        """Play the deduced moves, returns whether there were any.
+
+        Numbers in chords have all their mines flagged, so their squares
+        are opened with one chord each instead of one click per square.
+        """
+        for i in sorted(mines):
+            self.flag(i)
+        for i in sorted(chords):
+            self.chord(i)
+        for i in sorted(safe):
+            self.open(i)
+        return bool(safe or mines)
+
+    # RULES
+
+    def singles(self):
+        """Rule 1, only looks at the numbers that changed.
+
+        Returns (safe, mines, chords), chords being the numbers that are
+        already satisfied.
+        """
+        safe, mines, chords = set(), set(), set()
+        while self.todo:
+            i = self.todo.pop()
+            cells, need = self.constraint(i)
+            if not cells:
+                self.frontier.discard(i)
+                continue
+            self.frontier.add(i)
+            if need == 0:
+                safe.update(cells)
+                chords.add(i)
+            elif need == len(cells):
+                mines.update(cells)
+        return safe, mines, chords
+
+    def constraints(self) -> Dict[int, Tuple[frozenset, int]]:
+        out = {}
+        for i in list(self.frontier):
+            cells, need = self.constraint(i)
+            if cells:
+                out[i] = (frozenset(cells), need)
+            else:
+                self.frontier.discard(i)
+        return out
+
+    def subsets(self):
+        """Rule 2, compares every pair of numbers that share a square."""
+        cons = self.constraints()
+        bycell: Dict[int, List[int]] = {}
+        for i, (cells, _) in cons.items():
+            for c in cells:
+                bycell.setdefault(c, []).append(i)
+
+        safe, mines = set(), set()
+        for a, (acells, aneed) in cons.items():
+            others = {b for c in acells for b in bycell[c]}
+            for b in others:
+                bcells, bneed = cons[b]
+                if b == a or not acells < bcells:
+                    continue
+                rest = bcells - acells
+                if bneed == aneed:
+                    safe |= rest
+                elif bneed - aneed == len(rest):
+                    mines |= rest
+        return safe, mines
+
+    @staticmethod
+    def components(cons):
+        """Split the constraints into groups that share no covered squares.
+
+        Returns a list of (cells, constraints) pairs.
+        """
+        parent = {}
+
+        def find(c):
+            while parent[c] != c:
+                parent[c] = parent[parent[c]]
+                c = parent[c]
+            return c
+
+        for cells, _ in cons.values():
+            first = None
+            for c in cells:
+                parent.setdefault(c, c)
+                if first is None:
+                    first = find(c)
+                else:
+                    parent[find(c)] = first
+
+        groups = {}
+        for cells, need in cons.values():
+            root = find(next(iter(cells)))
+            groups.setdefault(root, []).append((cells, need))
+
+        out = []
+        for group in groups.values():
+            cells = set()
+            for c, _ in group:
+                cells |= c
+            out.append((cells, group))
+        return out
+
+    @staticmethod
+    def enumerate(cells, group):
+        """Count every consistent mine layout of one component.
+
+        Returns (dist, percell) where dist[k] is the number of layouts with
+        k mines and percell[c][k] the number of those with a mine on c.
+        """
+        # order the squares so constraints get finished as early as
+        # possible, which prunes the search a lot sooner
+        order = []
+        seen = set()
+        for cset, _ in sorted(group, key=lambda g: len(g[0])):
+            for c in sorted(cset):
+                if c not in seen:
+                    seen.add(c)
+                    order.append(c)
+        pos = {c: n for n, c in enumerate(order)}
+
+        # per constraint: [need, assigned mines, unassigned squares]
+        state = [[need, 0, len(cset)] for cset, need in group]
+        touching = [[] for _ in order]
+        for ci, (cset, _) in enumerate(group):
+            for c in cset:
+                touching[pos[c]].append(ci)
+
+        dist: Dict[int, int] = {}
+        percell = {c: {} for c in order}
+        assigned = [0] * len(order)
+
+        def recurse(n, mines):
+            if n == len(order):
+                dist[mines] = dist.get(mines, 0) + 1
+                for c, val in zip(order, assigned):
+                    if val:
+                        counts = percell[c]
+                        counts[mines] = counts.get(mines, 0) + 1
+                return
+            for val in (0, 1):
+                ok = True
+                for ci in touching[n]:
+                    st = state[ci]
+                    st[1] += val
+                    st[2] -= 1
+                    if st[1] > st[0] or st[1] + st[2] < st[0]:
+                        ok = False
+                if ok:
+                    assigned[n] = val
+                    recurse(n+1, mines+val)
+                for ci in touching[n]:
+                    st = state[ci]
+                    st[1] -= val
+                    st[2] += 1
+
+        recurse(0, 0)
+        return dist, percell
+
+    def probabilities(self):
+        """Chance of a mine for every frontier square plus the rest.
+
+        Returns (probs, framed, rest) where probs maps frontier squares to
+        (numerator, denominator) pairs, framed is the set of squares in
+        probs and rest the probability shared by every other unknown square
+        (None if there are none). Exact integers are kept so 0 and 1 can be
+        told apart safely.
+        """
+        cons = self.constraints()
+        comps = []
+        framed = set()
+        for cells, group in self.components(cons):
+            if len(cells) > self.maxcomponent:
+                continue
+            dist, percell = self.enumerate(cells, group)
+            comps.append((dist, percell))
+            framed |= cells
+
+        # flags are never on uncovered squares so this counts the unknowns
+        unknowns = self.grid.cellno - self.grid.total("uncovered") - self.grid.total("flag")
+        left = self.board.flagged  # mines that aren't flagged yet
+        probs, rest = combine(comps, unknowns - len(framed), left)
+        return probs, framed, rest
+
+    def interior(self, framed):
+        """Iterate the unknown squares that aren't in framed."""
+        for i in range(self.grid.cellno):
+            if self.unknown(i) and i not in framed:
+                yield i
+
+    def deduce(self):
+        """Rule 3, returns (safe, mines, probs, framed, rest)."""
+        probs, framed, rest = self.probabilities()
+        safe = {c for c, (num, _) in probs.items() if num == 0}
+        mines = {c for c, (num, den) in probs.items() if num == den}
+        if rest is not None:
+            if rest[0] == 0:
+                safe.update(self.interior(framed))
+            elif rest[0] == rest[1]:
+                mines.update(self.interior(framed))
+        return safe, mines, probs, framed, rest
+
+    # PLAYING
+
+    def step(self) -> bool:
+        """Make at least one move. Returns False when stuck (or done)."""
+        if self.board.over:
+            return False
+
+        if self.apply(*self.singles()):
+            return True
+        if self.apply(*self.subsets()):
+            return True
+
+        safe, mines, probs, framed, rest = self.deduce()
+        if self.apply(safe, mines):
+            return True
+        if not self.guess:
+            return False
+
+        # guess the square that's least likely to be a mine
+        best: Optional[int] = None
+        bestp = 2.0
+        for c, (num, den) in probs.items():
+            if num / den < bestp:
+                best, bestp = c, num / den
+        if rest is not None and rest[0] / rest[1] < bestp:
+            best = next(self.interior(framed))
+        if best is None:
+            return False
+
+        self.guesses += 1
+        self.open(best)
+        return True
+
+    def play(self, first=None) -> SolveResult:
+        """Play the board until it's won, lost or stuck."""
+        start = perf_counter()
+        if self.grid.total("uncovered") == 0:
+            if first is None:
+                first = (self.grid.cols() // 2, self.grid.rows() // 2)
+            self.open(self.grid.index(first))
+
+        while self.step():
+            pass
+
+        return SolveResult(
+            won=self.board.state is State.won,
+            moves=self.moves,
+            guesses=self.guesses,
+            time=perf_counter() - start
+        )
+
+def _convolve(a, b):
+    out = {}
+    for ka, va in a.items():
+        for kb, vb in b.items():
+            out[ka+kb] = out.get(ka+kb, 0) + va*vb
+    return out
+
+def combine(comps, inside, left):
+    """Turn enumerated components into mine chances.
+
+    comps is a list of (dist, percell) from Solver.enumerate, inside the
+    number of unknown squares in none of them and left the mines that
+    aren't known yet. Every layout is weighted by the ways the mines it
+    doesn't use fit in the inside squares. Returns (probs, rest) with
+    (numerator, denominator) pairs like Solver.probabilities, ({}, None)
+    if nothing fits.
+    """
+    # distributions of all the components except one, via prefix/suffix
+    prefix = [{0: 1}]
+    for dist, _ in comps:
+        prefix.append(_convolve(prefix[-1], dist))
+    suffix = [{0: 1}]
+    for dist, _ in reversed(comps):
+        suffix.append(_convolve(suffix[-1], dist))
+    suffix.reverse()
+
+    def fits(k):
+        """Ways to put the mines the frontier doesn't use in the interior."""
+        return comb(inside, left - k) if 0 <= left - k <= inside else 0
+
+    total = sum(v * fits(k) for k, v in prefix[-1].items())
+    if total == 0:
+        return {}, None
+
+    probs = {}
+    for n, (dist, percell) in enumerate(comps):
+        others = _convolve(prefix[n], suffix[n+1])
+        weight = {
+            k: sum(v * fits(k + j) for j, v in others.items())
+            for k in dist
+        }
+        for c, counts in percell.items():
+            probs[c] = (sum(v * weight[k] for k, v in counts.items()), total)
+
+    rest = None
+    if inside:
+        expected = sum(v * fits(k) * (left - k) for k, v in prefix[-1].items())
+        rest = (expected, total * inside)
+    return probs, rest
+
+def solve(board: Board, first=None, guess: bool = True) -> SolveResult:
+    """Shortcut to play a board with a fresh Solver."""
+    return Solver(board, guess=guess).play(first)
@@ -0,0 +1,166 @@
+"""Board topologies, which squares count as neighbours
+
+  square - the normal 8 squares around
+  torus  - the same, but the edges wrap around to the other side
+  hex    - hexagons, stored as rows where every odd row is pushed half a
+           square to the right (like bricks) so each cell touches 6 others
+  knight - the 8 squares a chess knight could jump to
+
+Every topology is a list of moves (dx, dy), hex boards have different
+moves on odd rows. The neighbours of every cell of a board shape are
+worked out once into a CSR table (a flat array of every cell's
+neighbours, one after the other, and where each cell's run starts):
+
+    neighbours of i = indices[offsets[i]:offsets[i+1]]
+
+so looking them up is a slice with no bounds checks, and the table is
+shared by every board of the same shape. Boards too big for a table
+(see mod/grid.py) work them out from the moves every time with around().
+"""
+
+from array import array
+from functools import lru_cache
+from itertools import accumulate
+from typing import NamedTuple
+
+class Topology(NamedTuple):
+    name: str
+    moves: tuple
+    oddmoves: tuple  # moves on odd rows
+    wrap: bool = False
+
+_king = ((-1, -1), (0, -1), (1, -1), (-1, 0), (1, 0), (-1, 1), (0, 1), (1, 1))
+_knight = ((-1, -2), (1, -2), (-2, -1), (2, -1), (-2, 1), (2, 1), (-1, 2), (1, 2))
+
+TOPOLOGIES = {
+    "square": Topology("square", _king, _king),
+    "torus": Topology("torus", _king, _king, wrap=True),
+    "hex": Topology(
+        "hex",
+        ((-1, -1), (0, -1), (-1, 0), (1, 0), (-1, 1), (0, 1)),
+        ((0, -1), (1, -1), (-1, 0), (1, 0), (0, 1), (1, 1))
+    ),
+    "knight": Topology("knight", _knight, _knight),
+}
+NAMES = tuple(TOPOLOGIES)  # the order matters, codes and saves use the index
+
+class Table(NamedTuple):
+    offsets: array  # n + 1 entries
+    indices: array
+
+_NONE = 0xFFFFFFFF  # a neighbour off the board
+
+def get(name: str) -> Topology:
+    try:
+        return TOPOLOGIES[name]
+    except KeyError:
+        raise ValueError(f"Unknown board shape {name!r}") from None
+
+@lru_cache(maxsize=16)
+def table(name: str, width: int, height: int) -> Table:
+    """The neighbour table of a board shape (cached).
+
+    It's built a whole move at a time: for every move there's a column
+    with the neighbour of each cell in that direction (or _NONE), the
+    columns are interleaved into one array with slice assignments and the
+    _NONE entries are cut out of its bytes in one go. Indices always fit
+    in 31 bits so _NONE's 0xFF bytes can't show up inside a real index
+    and the cut never lands between two entries.
+    """
+    topo = get(name)
+    n = width * height
+    if n >= 1 << 31:
+        raise ValueError("Board too big for a neighbour table")
+    if topo.wrap and (width < 3 or height < 3):
+        # the wrapped moves would land on the same cell twice
+        return _slowtable(topo, width, height)
+
+    k = len(topo.moves)
+    flat = array("I", bytes(4 * n * k))
+    counts = 0  # neighbours per cell, a byte each (like Grid.recount)
+    for d in range(k):
+        column = array("I")
+        valid = bytearray()
+        for y in range(height):
+            dx, dy = (topo.oddmoves if y & 1 else topo.moves)[d]
+            ny = y + dy
+            if topo.wrap:
+                ny %= height
+            elif not 0 <= ny < height:
+                column.extend(array("I", [_NONE]) * width)
+                valid += bytes(width)
+                continue
+            base = ny * width
+            if topo.wrap:
+                s = dx % width
+                row = array("I", range(base, base + width))
+                column.extend(row[s:] + row[:s])
+                valid += b"\x01" * width
+            else:
+                # moves longer than the board is wide have no neighbours
+                lo = min(max(0, -dx), width)
+                hi = max(min(width, width - dx), lo)
+                column.extend(array("I", [_NONE]) * lo)
+                column.extend(array("I", range(base + lo + dx, base + hi + dx)))
+                column.extend(array("I", [_NONE]) * (width - hi))
+                valid += bytes(lo) + b"\x01" * (hi - lo) + bytes(width - hi)
+        flat[d::k] = column
+        counts += int.from_bytes(valid, "little")
+
+    indices = array("I")
+    indices.frombytes(flat.tobytes().replace(b"\xff\xff\xff\xff", b""))
+    offsets = array("I", accumulate(counts.to_bytes(n, "little"), initial=0))
+    return Table(offsets, indices)
+
+@lru_cache(maxsize=16)
+def _steps(name: str, width: int):
+    """How far every move goes in flat indices (even rows, odd rows), and
+    the furthest a move reaches in x or y.
+    """
+    topo = get(name)
+    steps = tuple(
+        tuple(dy * width + dx for dx, dy in moves)
+        for moves in (topo.moves, topo.oddmoves)
+    )
+    reach = max(max(abs(dx), abs(dy)) for dx, dy in topo.moves + topo.oddmoves)
+    return steps, reach
+
+def around(name: str, width: int, height: int, i: int) -> list:
+    """The neighbours of flat index i worked out from the moves, in the
+    same order as the table has them.
+    """
+    steps, reach = _steps(name, width)
+    y, x = divmod(i, width)
+    if reach <= x < width - reach and reach <= y < height - reach:
+        # nowhere near an edge, every move lands on the board
+        return [i + d for d in steps[y & 1]]
+
+    topo = get(name)
+    moves = topo.oddmoves if y & 1 else topo.moves
+    if not topo.wrap:
+        return [
+            i + dy * width + dx for dx, dy in moves
+            if 0 <= x + dx < width and 0 <= y + dy < height
+        ]
+    out = []
+    for dx, dy in moves:
+        j = (y + dy) % height * width + (x + dx) % width
+        # tiny boards wrap onto the same cell more than once
+        if j != i and j not in out:
+            out.append(j)
+    return out
+
+def _slowtable(topo, width, height) -> Table:
+    """Cell by cell, for tiny wrapped boards."""
+    offsets = array("I", [0])
+    indices = array("I")
+    for y in range(height):
+        for x in range(width):
+            seen = set()
+            for dx, dy in (topo.oddmoves if y & 1 else topo.moves):
+                j = ((y + dy) % height) * width + (x + dx) % width
+                if j != y * width + x and j not in seen:
+                    seen.add(j)
+                    indices.append(j)
+            offsets.append(len(indices))
+    return Table(offsets, indices)
@@ -0,0 +1,64 @@
+"""Replay tool, for the replays the game saves in replays/
+
+    python replay.py watch replays/20240101-120000.msr --speed 2
+    python replay.py verify replays/*.msr
+
+`watch` plays a replay in the game window (speed 0 does it all at once),
+`verify` plays replays headlessly as fast as the engine goes over a
+process pool and prints one line per replay with how it ended.
+"""
+
+import argparse
+import os
+import sys
+from multiprocessing import Pool
+
+from mod.replay import Replay, verify
+
+def check(path):
+    """Worker side: verify one replay, returns a line for the report."""
+    try:
+        res = verify(path)
+    except (OSError, ValueError) as e:
+        return path, False, f"broken: {e}"
+    return path, True, f"{res.board.state.name}, {res.moves} moves, {res.time / 1000:.1f}s"
+
+def cmd_verify(args):
+    broken = 0
+    with Pool(args.workers) as pool:
+        for path, ok, line in pool.imap(check, args.files, chunksize=16):
+            broken += not ok
+            print(f"{path}: {line}")
+    print(f"{len(args.files)} replays, {broken} broken", file=sys.stderr)
+    return 1 if broken else 0
+
+def cmd_watch(args):
+    from consts import FPS
+    from game import Minesweeper
+
+    # no save, so there's no "carry on?" question and the saved game
+    # doesn't get thrown away
+    s = Minesweeper(savepath=None)
+    s.watch(Replay(args.file), args.speed)
+    s.mainloop(FPS)
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Watch or verify replays")
+    cmds = parser.add_subparsers(dest="cmd", required=True)
+
+    ver = cmds.add_parser("verify", help="play replays headlessly")
+    ver.add_argument("files", nargs="+")
+    ver.add_argument("--workers", type=int, default=os.cpu_count(), help="processes to use")
+    ver.set_defaults(run=cmd_verify)
+
+    wat = cmds.add_parser("watch", help="play a replay in the game window")
+    wat.add_argument("file")
+    wat.add_argument("--speed", type=float, default=1.0, help="2 is twice as fast, 0 is instant")
+    wat.set_defaults(run=cmd_watch)
+
+    args = parser.parse_args(argv)
+    return args.run(args)
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
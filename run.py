@@ -1,5 +1,8 @@
-from game import Minesweeper
-from consts import FPS
+# the imports are in here too because the no-guess generator's worker
+# processes import this file again on platforms that spawn them
+if __name__ == "__main__":
+    from game import Minesweeper
+    from consts import FPS
 
-s = Minesweeper()
-s.mainloop(FPS)
+    s = Minesweeper()
+    s.mainloop(FPS)
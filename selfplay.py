@@ -0,0 +1,134 @@
+"""Self-play batch runner
+
+Plays lots of seeded games with the solver over a process pool, e.g.
+
+    python selfplay.py --size 30x16 --mines 99 --games 100000 --out games.jsonl
+
+Each game's result is written as a JSON line as soon as it's done (use
+`--out -` for stdout) and the totals are printed at the end. Game n
+always uses seed `--seed + n` so any game can be replayed on its own.
+`python bench.py selfplay` shows how it scales over the cores.
+"""
+
+import argparse
+import json
+import os
+import sys
+from multiprocessing import Pool
+from time import perf_counter
+
+from mod.engine import Board
+from mod.solver import solve
+
+class Stats:
+    """Totals over a bunch of games."""
+
+    def __init__(self):
+        self.games = 0
+        self.wins = 0
+        self.moves = 0
+        self.guesses = 0
+        self.time = 0.0
+        self.bbbv = 0
+        self.openings = 0
+        self.wonbbbv = 0
+        self.wontime = 0.0
+
+    def add(self, res):
+        self.games += 1
+        self.wins += res["won"]
+        self.moves += res["moves"]
+        self.guesses += res["guesses"]
+        self.time += res["time"]
+        self.bbbv += res["3bv"]
+        self.openings += res["openings"]
+        if res["won"]:
+            self.wonbbbv += res["3bv"]
+            self.wontime += res["time"]
+
+    def summary(self):
+        games = max(self.games, 1)
+        return {
+            "games": self.games,
+            "winrate": self.wins / games,
+            "moves": self.moves / games,
+            "guesses": self.guesses / games,
+            "time": self.time / games,
+            "3bv": self.bbbv / games,
+            "openings": self.openings / games,
+            "3bv/s": self.wonbbbv / self.wontime if self.wontime else 0.0,
+        }
+
+def playgame(width, height, mines, seed):
+    """Play one seeded game, returns its result as a dict."""
+    board = Board(width, height, mines, seed=seed)
+    res = solve(board)
+    return {
+        "seed": seed,
+        "code": board.code,
+        "won": res.won,
+        "moves": res.moves,
+        "guesses": res.guesses,
+        "time": res.time,
+        "3bv": board.threebv(),
+        "openings": board.openings.count,
+    }
+
+def playjob(job):
+    """Worker side: play one game of (width, height, mines, seed)."""
+    return playgame(*job)
+
+def run(width, height, mines, games, seed=0, workers=None, batch=1, out=None):
+    """Play the games over a process pool, returns their Stats.
+
+    The games go to the workers `batch` at a time and come back the same
+    way, so results only stream one by one with a batch of 1 (sending a
+    game to a worker costs far less than playing it).
+    """
+    jobs = ((width, height, mines, s) for s in range(seed, seed + games))
+    total = Stats()
+    with Pool(workers) as pool:
+        for res in pool.imap_unordered(playjob, jobs, chunksize=batch):
+            total.add(res)
+            if out is not None:
+                out.write(json.dumps(res) + "\n")
+                out.flush()
+    return total
+
+def parsesize(text):
+    w, h = text.lower().split("x")
+    return int(w), int(h)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play lots of games with the solver")
+    parser.add_argument("--size", type=parsesize, default=(30, 16), help="WIDTHxHEIGHT")
+    parser.add_argument("--mines", type=int, default=99)
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first game")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="processes to use")
+    parser.add_argument("--batch", type=int, default=1, help="games sent to a worker at once")
+    parser.add_argument("--out", help="file for the per game results ('-' for stdout)")
+    args = parser.parse_args(argv)
+
+    width, height = args.size
+    if args.out == "-":
+        out = sys.stdout
+    elif args.out:
+        out = open(args.out, "w")
+    else:
+        out = None
+
+    start = perf_counter()
+    try:
+        stats = run(width, height, args.mines, args.games, args.seed, args.workers, args.batch, out)
+    finally:
+        if out not in (None, sys.stdout):
+            out.close()
+    elapsed = perf_counter() - start
+
+    summary = stats.summary()
+    summary["games/s"] = stats.games / elapsed if elapsed else 0.0
+    print(json.dumps(summary, indent=2), file=sys.stderr)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -5,16 +5,30 @@ from __future__ import annotations
 import tkinter as tk
 from typing import TYPE_CHECKING, Optional
 
+from mod.topology import NAMES
+
 if TYPE_CHECKING:
     from game import Minesweeper
 
+def newroot() -> Optional[tk.Tk]:
+    """The hidden Tk root the settings window and the message boxes go
+    on, it has to be made before pygame starts (see consts.py). None if
+    Tk can't open a window here (no display).
+    """
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        return None
+    root.withdraw()
+    return root
+
 class SettingsWin:
-    def __init__(self):
+    def __init__(self, root: tk.Tk):
         # TODO: type this better
         self._game: Optional[Minesweeper] = None
         self.active = False
 
-        self._win = tk.Tk()
+        self._win = root
         # TODO: how to place window in center of screen? idk
         # self._win.eval('tk::PlaceWindow . center')
 
@@ -24,15 +38,29 @@ class SettingsWin:
         self._height: tk.IntVar = self._option("Minefield Height:")
         self._width: tk.IntVar = self._option("Minefield Width:")
 
+        self._noguess = tk.IntVar(self._win)
+        tk.Checkbutton(self._win, text="No guessing needed", variable=self._noguess).pack()
+
+        # endless boards are always square
+        self._topology = tk.StringVar(self._win, NAMES[0])
+        tk.Label(self._win, text="Board Shape:").pack()
+        tk.OptionMenu(self._win, self._topology, *NAMES).pack()
+
+        self._endless = tk.IntVar(self._win)
+        tk.Checkbutton(self._win, text="Endless board", variable=self._endless).pack()
+
+        # shows the code of the current board, paste another to play it
+        self._code: tk.StringVar = self._option("Board Code:", tk.StringVar)
+
         # submit button
         tk.Button(self._win, text="Submit", command=self._submit).pack()
 
         # hide the window
         self._win.withdraw()
 
-    def _option(self, text):
+    def _option(self, text, kind=tk.IntVar):
         """Common code for all option creation"""
-        opt = tk.IntVar(self._win)
+        opt = kind(self._win)
         tk.Label(self._win, text=text).pack()
         mentry = tk.Entry(self._win, textvariable=opt)
         mentry.pack()
@@ -56,6 +84,10 @@ class SettingsWin:
         self._minesno.set(self._game.minesno)
         self._height.set(self._game.height)
         self._width.set(self._game.width)
+        self._noguess.set(int(self._game.noguess))
+        self._topology.set(self._game.topology)
+        self._endless.set(int(self._game.endless))
+        self._code.set(self._game.field.board.code or "")
         self._win.deiconify()
 
     def done(self):
@@ -74,3 +106,19 @@ class SettingsWin:
     def width(self):
         """Retrieve input for width of field"""
         return int(self._width.get())
+
+    def noguess(self):
+        """Retrieve input for no-guess boards"""
+        return bool(self._noguess.get())
+
+    def topology(self):
+        """Retrieve input for the board shape"""
+        return self._topology.get()
+
+    def endless(self):
+        """Retrieve input for endless boards"""
+        return bool(self._endless.get())
+
+    def code(self):
+        """Retrieve input for the board code"""
+        return self._code.get().strip()
@@ -0,0 +1,137 @@
+"""Checks of the board rules (mod/engine.py) on every topology
+
+Neighbours are worked out from the moves (topology.around) so the
+tables and the square board's shortcuts get checked against them.
+"""
+
+import pytest
+
+from mod import grid
+from mod.engine import Board, State
+from mod.topology import NAMES, around
+
+WIDTH, HEIGHT, MINES = 16, 12, 30
+FIRST = (8, 6)
+
+def newboard(topology, seed=1):
+    board = Board(WIDTH, HEIGHT, MINES, seed=seed, topology=topology)
+    board.click(FIRST)
+    return board
+
+def near(topology, i):
+    return around(topology, WIDTH, HEIGHT, i)
+
+def uncovered(board):
+    return bytes(board.grid.layer("uncovered"))
+
+@pytest.mark.parametrize("topology", NAMES)
+def test_counts(topology):
+    board = newboard(topology)
+    mine, cnt = board.grid.layer("mine"), board.grid.layer("count")
+    assert sum(mine) == MINES
+    for i in range(WIDTH * HEIGHT):
+        assert cnt[i] == (0 if mine[i] else sum(mine[j] for j in near(topology, i)))
+
+@pytest.mark.parametrize("topology", NAMES)
+@pytest.mark.parametrize("seed", range(5))
+def test_flood(topology, seed):
+    board = newboard(topology, seed)
+    grid = board.grid
+    cnt = grid.layer("count")
+    # everything reachable from the first click through empty squares
+    start = grid.index(FIRST)
+    seen, stack = {start}, [start]
+    while stack:
+        i = stack.pop()
+        if cnt[i] == 0:
+            for j in near(topology, i):
+                if j not in seen:
+                    seen.add(j)
+                    stack.append(j)
+    assert {i for i, u in enumerate(uncovered(board)) if u} == seen
+    assert board.state is State.playing
+
+def safearound(board, topology, i):
+    """The covered squares around i without a mine."""
+    unc, mine = board.grid.layer("uncovered"), board.grid.layer("mine")
+    return [j for j in near(topology, i) if not unc[j] and not mine[j]]
+
+def chordable(board, topology, wrong=False):
+    """An uncovered number with a safe covered square around it (as many
+    as its number to flag them all wrong).
+    """
+    unc, cnt = board.grid.layer("uncovered"), board.grid.layer("count")
+    for i in range(WIDTH * HEIGHT):
+        if unc[i] and cnt[i] and len(safearound(board, topology, i)) >= (cnt[i] if wrong else 1):
+            return i
+    return None
+
+@pytest.mark.parametrize("topology", NAMES)
+def test_chord(topology):
+    board = newboard(topology)
+    grid = board.grid
+    i = chordable(board, topology)
+    assert i is not None
+    mine = grid.layer("mine")
+    for j in near(topology, i):
+        if mine[j]:
+            board.click(grid.pos(j), flagging=True)
+    assert board.chord(grid.pos(i))
+    unc = grid.layer("uncovered")
+    assert all(unc[j] or mine[j] for j in near(topology, i))
+    assert board.state is not State.lost
+
+@pytest.mark.parametrize("topology", NAMES)
+def test_wrong_chord(topology):
+    board = newboard(topology)
+    grid = board.grid
+    i = chordable(board, topology, wrong=True)
+    assert i is not None
+    # flag safe squares instead of the mines
+    for j in safearound(board, topology, i)[:grid.layer("count")[i]]:
+        board.click(grid.pos(j), flagging=True)
+    board.chord(grid.pos(i))
+    assert board.state is State.lost
+
+@pytest.mark.parametrize("topology", NAMES)
+def test_undo_redo(topology):
+    board = Board(WIDTH, HEIGHT, MINES, seed=3, topology=topology)
+    mine = None
+    history = [uncovered(board)]
+    for cell in (FIRST, (0, 0), (15, 11), (3, 9), (12, 2)):
+        if mine is not None and mine[board.grid.index(cell)]:
+            board.click(cell, flagging=True)
+        else:
+            board.click(cell)
+        mine = board.grid.layer("mine")
+        history.append(uncovered(board))
+    flagged = board.flagged
+
+    while board.undos:
+        board.undo()
+    assert uncovered(board) == history[0]
+    assert board.flagged == MINES
+    while board.redos:
+        board.redo()
+    assert uncovered(board) == history[-1]
+    assert board.flagged == flagged
+
+@pytest.mark.parametrize("topology", NAMES)
+def test_code_roundtrip(topology):
+    board = newboard(topology, seed=7)
+    again = Board.fromcode(board.code)
+    assert again.grid.topology == topology
+    assert bytes(again.grid.layer("mine")) == bytes(board.grid.layer("mine"))
+    assert uncovered(again) == uncovered(board)
+    assert again.code == board.code
+
+@pytest.mark.parametrize("topology", NAMES)
+def test_without_table(topology, monkeypatch):
+    """Boards over grid.TABLELIMIT work neighbours out without a table."""
+    small = newboard(topology)
+    monkeypatch.setattr(grid, "TABLELIMIT", 0)
+    big = newboard(topology)
+    assert not big.grid.usetable()
+    assert bytes(big.grid.layer("count")) == bytes(small.grid.layer("count"))
+    assert uncovered(big) == uncovered(small)
+    assert big.threebv() == small.threebv()